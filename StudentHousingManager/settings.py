@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware', # First, so it sees every query
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -42,6 +43,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'axes.middleware.AxesMiddleware', # Axes must be before Auth
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware', # After Auth, to recognise superusers
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -50,7 +52,7 @@ ROOT_URLCONF = 'StudentHousingManager.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templating.DjangoTemplates',  # Django's, timed for the request metrics
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -78,6 +80,36 @@ DATABASES = {
 }
 
 
+# Cache
+# Dashboard snapshots and versioned namespaces (see core/cache.py) live here.
+# Invalidation bumps a version in this cache, so every worker process must
+# share it: use Redis (or the database cache) whenever more than one runs.
+# The in-process default only suits runserver and the tests.
+
+if os.environ.get('DJANGO_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['DJANGO_REDIS_URL'],
+        }
+    }
+elif os.environ.get('DJANGO_CACHE_TABLE'):
+    # Create it with `python manage.py createcachetable`.
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': os.environ['DJANGO_CACHE_TABLE'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'student-housing',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -121,6 +153,12 @@ STATICFILES_DIRS = [
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are stored once per distinct content (see core.storage).
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -163,6 +201,44 @@ AXES_COOLOFF_TIME = 1 # hour
 AXES_LOCKOUT_TEMPLATE = 'lockout.html'
 AXES_RESET_ON_SUCCESS = True
 
+# Request Metrics (core/middleware.py)
+METRICS_ENABLED = os.environ.get('DJANGO_METRICS_ENABLED', 'True') == 'True'
+# Maximum SQL queries per URL name; a view over budget logs a warning.
+QUERY_BUDGETS = {
+    'admin_dashboard': 10,
+    'supervisor_dashboard': 10,
+    'student_dashboard': 10,
+    'home': 5,
+}
+QUERY_BUDGET_DEFAULT = None
+# Raise instead of warning, e.g. when running the test suite.
+QUERY_BUDGET_RAISE = os.environ.get('DJANGO_QUERY_BUDGET_RAISE', 'False') == 'True'
+
+# Request Profiling (core/profiling.py)
+PROFILING_ENABLED = os.environ.get('DJANGO_PROFILING_ENABLED', 'False') == 'True'
+PROFILING_DIR = os.environ.get('DJANGO_PROFILING_DIR', str(BASE_DIR / 'profiles'))
+# Share of all requests to profile (0.01 = 1%); superusers can add ?profile to any URL.
+PROFILING_SAMPLE_RATE = float(os.environ.get('DJANGO_PROFILING_SAMPLE_RATE', '0'))
+PROFILING_TOP = 40
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['console'],
+            'level': os.environ.get('DJANGO_METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Security Configuration
 if not DEBUG:
     # Security Headers
@@ -1,6 +1,8 @@
 from django import forms
 from .models import CustomUser
 
+from core.forms import NormalizedImageField
+from housing.allocation import allocate
 from housing.models import Building, Room
 from .models import CustomUser, StudentProfile
 
@@ -87,36 +89,35 @@ class UserCreateForm(forms.ModelForm):
         user.set_password(self.cleaned_data['password'])
         
         if commit:
-            user.save()
-            
-            # Handle Student Housing Assignment
-            if user.role == CustomUser.Role.STUDENT.value or user.role == 'STUDENT':
-                room = self.cleaned_data.get('room')
-                building = self.cleaned_data.get('building')
-                
-                if room and building:
-                    # Create/Update StudentProfile
-                    profile, created = StudentProfile.objects.get_or_create(user=user)
-                    profile.room = room
-                    profile.save()
-                    
-                    # Create HousingApplication with ACCEPTED status
-                    HousingApplication.objects.create(
-                        student=user,
-                        name=f"{user.first_name} {user.last_name}",
-                        phone=user.phone or '',
-                        age=user.age if user.age else 20,
-                        governorate=user.governorate if user.governorate else "Sana'a",
-                        status=HousingApplication.Status.ACCEPTED,
-                        assigned_building=building,
-                        assigned_room=room
-                    )
-                    
-                    # Update Room Occupancy
-                    room.current_occupants += 1
-                    if room.is_full():
-                        room.status = Room.Status.OCCUPIED
-                    room.save()
+            room = self.cleaned_data.get('room')
+            building = self.cleaned_data.get('building')
+            is_student = user.role == CustomUser.Role.STUDENT.value or user.role == 'STUDENT'
+            if not (is_student and room and building):
+                user.save()
+                return user
+
+            def create_student():
+                user.save()
+
+                # Create/Update StudentProfile
+                profile, created = StudentProfile.objects.get_or_create(user=user)
+                profile.room = room
+                profile.save()
+
+                # Create HousingApplication with ACCEPTED status
+                HousingApplication.objects.create(
+                    student=user,
+                    name=f"{user.first_name} {user.last_name}",
+                    phone=user.phone or '',
+                    age=user.age if user.age else 20,
+                    governorate=user.governorate if user.governorate else "Sana'a",
+                    status=HousingApplication.Status.ACCEPTED,
+                    assigned_building=building,
+                    assigned_room=room
+                )
+
+            # Reserve the bed first; if the room filled up meanwhile nothing is saved.
+            allocate(room, create_student)
                     
         return user
 
@@ -185,8 +186,8 @@ class RegistrationForm(forms.ModelForm):
             'age': forms.NumberInput(attrs={'class': 'form-control'}),
         }
     
-    profile_image = forms.ImageField(required=True, widget=forms.FileInput(attrs={'class': 'form-control'}))
-    university_card_image = forms.ImageField(required=True, widget=forms.FileInput(attrs={'class': 'form-control'}))
+    profile_image = NormalizedImageField(required=True, widget=forms.FileInput(attrs={'class': 'form-control'}))
+    university_card_image = NormalizedImageField(required=True, widget=forms.FileInput(attrs={'class': 'form-control'}))
     
     def clean_student_id(self):
         """Validate student ID: must be 8 digits and start with 2"""
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_current_application(apps, schema_editor):
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    HousingApplication = apps.get_model('applications', 'HousingApplication')
+    latest = HousingApplication.objects.filter(student=OuterRef('pk')).order_by('-pk')
+    CustomUser.objects.update(
+        current_application=Subquery(latest.values('pk')[:1]),
+        current_application_status=Coalesce(Subquery(latest.values('status')[:1]), Value('')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_alter_customuser_age'),
+        ('applications', '0003_alter_housingapplication_profile_image_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='current_application',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='applications.housingapplication'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='current_application_status',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.RunPython(backfill_current_application, migrations.RunPython.noop),
+    ]
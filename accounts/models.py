@@ -61,6 +61,10 @@ class CustomUser(AbstractUser):
     university_id_photo = models.ImageField(upload_to='users/ids/', blank=True, null=True)
     
     is_approved = models.BooleanField(default=False)  
+
+    # Latest housing application, kept in sync by applications.signals
+    current_application = models.ForeignKey('applications.HousingApplication', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    current_application_status = models.CharField(max_length=20, blank=True, default='')
     
     objects = CustomUserManager()  
 
@@ -1,4 +1,6 @@
-from django.test import TestCase, Client
+import tempfile
+
+from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from applications.models import HousingApplication
@@ -9,6 +11,11 @@ User = get_user_model()
 
 class AccountTests(TestCase):
     def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
         self.client = Client()
         self.register_url = reverse('register')
         self.login_url = reverse('login')
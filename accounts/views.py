@@ -3,7 +3,9 @@ from django.contrib.auth import get_user_model, login, authenticate
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from core.images import save_derivatives
 from applications.models import HousingApplication
+from housing.allocation import RoomUnavailable
 from .forms import RegistrationForm, UserCreateForm, UserEditForm
 
 User = get_user_model()
@@ -58,6 +60,9 @@ def register_view(request):
                 user.profile_photo = form.cleaned_data.get('profile_image')
                 user.university_id_photo = form.cleaned_data.get('university_card_image')
                 user.save()
+                for photo in (user.profile_photo, user.university_id_photo):
+                    if photo:
+                        save_derivatives(photo.name, storage=photo.storage)
 
                 HousingApplication.objects.create(
                     student=user,
@@ -65,8 +70,9 @@ def register_view(request):
                     phone=user.phone,
                     age=user.age if user.age else 18,
                     governorate=user.governorate,
-                    profile_image=form.cleaned_data.get('profile_image'), 
-                    university_card_image=form.cleaned_data.get('university_card_image'),
+                    # Point at the files just saved for the user instead of storing them again.
+                    profile_image=user.profile_photo.name or None,
+                    university_card_image=user.university_id_photo.name or None,
                     status=HousingApplication.Status.PENDING
                 )
 
@@ -91,8 +97,7 @@ def register_success_view(request):
     Redirects accepted students to their dashboard.
     """
     if request.user.role == 'STUDENT':
-         application = HousingApplication.objects.filter(student=request.user).last()
-         if application and application.status == HousingApplication.Status.ACCEPTED:
+         if request.user.current_application_status == HousingApplication.Status.ACCEPTED:
              return redirect('student_dashboard')
     
     return render(request, 'registration/register_success.html', {'full_page_layout': True})
@@ -144,9 +149,13 @@ def user_create(request):
     if request.method == 'POST':
         form = UserCreateForm(request.POST)
         if form.is_valid():
-            user = form.save()
-            messages.success(request, f'User "{user.username}" created with role "{user.role}".')
-            return redirect('user_list')
+            try:
+                user = form.save()
+            except RoomUnavailable:
+                form.add_error('room', 'Selected room is full.')
+            else:
+                messages.success(request, f'User "{user.username}" created with role "{user.role}".')
+                return redirect('user_list')
     else:
         form = UserCreateForm()
     return render(request, 'accounts/user_form.html', {'form': form, 'title': 'Add User'})
@@ -0,0 +1,488 @@
+"""
+Batch room allocation.
+
+``plan_allocation`` matches every pending application to a free bed in
+memory, from two reads: the pending applications and the rooms with a
+free bed. The constraints are:
+
+* gender separation: a building designated for one gender only takes
+  students of that gender, and in mixed buildings a room takes the
+  gender of its first occupant;
+* capacity: a room never gets more students than it has free beds;
+* building preferences: an applicant is placed in the preferred building
+  when it has a compatible bed;
+* cohorts: applicants are grouped by gender and governorate, and each
+  group is packed best-fit-decreasing: the largest group first, into the
+  building whose compatible free beds fit it most tightly, and split
+  across buildings only when no building can hold it. Within a building
+  beds are filled in room order, so a cohort shares rooms.
+
+``apply_allocation`` writes a plan in one transaction, with one
+executemany UPDATE per table (``core.bulk``), and brings everything that normally follows a save up to
+date (counters, rollups, current-application pointers, caches).
+
+``decide_applications`` accepts or rejects a reviewer's selection the
+same way: one transaction, one bulk write per table and one occupancy
+update per room, with an outcome reported for every application.
+"""
+from collections import Counter as Tally, defaultdict, namedtuple
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import counters, rollups
+from core.bulk import update_rows
+from core.cache import bump_version
+from core.scopes import SCOPE_NAMESPACE
+from core.stats import STATS_NAMESPACE
+from housing import availability
+from housing.allocation import allocate
+from housing.models import Building, Room
+
+from .models import HousingApplication
+from .queue import open_to
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+class ApplicationNotPending(Exception):
+    pass
+
+
+class ApplicationClaimed(Exception):
+    """Another reviewer holds a live lease on the application."""
+
+
+class AllocationConflict(Exception):
+    """Applications or rooms changed between reading and writing; nothing was saved."""
+
+
+class Assignment(namedtuple('Assignment', ['application', 'building', 'room'])):
+    @property
+    def building_id(self):
+        return self.building.pk
+
+
+class _Room:
+    __slots__ = ('pk', 'building_id', 'number', 'capacity', 'occupants', 'status', 'free', 'gender')
+
+    def __init__(self, pk, building_id, number, capacity, occupants, status, gender):
+        self.pk = pk
+        self.building_id = building_id
+        self.number = number
+        self.capacity = capacity
+        self.occupants = occupants
+        self.status = status
+        self.free = capacity - occupants
+        self.gender = gender  # None while a room in a mixed building is empty
+
+
+# Occupants of more than one gender already share the room: take nobody else.
+_CONFLICT = object()
+
+
+class _Building:
+    def __init__(self, pk, name, gender):
+        self.pk = pk
+        self.name = name
+        self.gender = gender
+        self.rooms = []
+        self.open_free = 0  # free beds in empty rooms of a mixed building
+        self.free_by_gender = Tally()
+
+    def add(self, room):
+        self.rooms.append(room)
+        if room.gender is None:
+            self.open_free += room.free
+        elif room.gender is not _CONFLICT:
+            self.free_by_gender[room.gender] += room.free
+
+    def accepts(self, gender):
+        return not self.gender or self.gender == gender
+
+    def compatible_free(self, gender):
+        return self.open_free + self.free_by_gender[gender] if self.accepts(gender) else 0
+
+    def place(self, members, gender):
+        """Seat as many ``members`` as fit; return the assignments made."""
+        placed = []
+        for room in self.rooms:
+            if len(placed) == len(members):
+                break
+            if not room.free or room.gender not in (None, gender):
+                continue
+            if room.gender is None:
+                self.open_free -= room.free
+                self.free_by_gender[gender] += room.free
+                room.gender = gender
+            taken = min(room.free, len(members) - len(placed))
+            for application in members[len(placed):len(placed) + taken]:
+                placed.append(Assignment(application, self, room))
+            room.free -= taken
+            self.free_by_gender[gender] -= taken
+        return placed
+
+
+class AllocationPlan:
+    def __init__(self, pending, buildings, assignments, unassigned, groups, groups_kept_together):
+        self.pending = pending
+        self.buildings = buildings
+        self.assignments = assignments
+        self.unassigned = unassigned
+        self.groups = groups
+        self.groups_kept_together = groups_kept_together
+
+    @property
+    def preferences(self):
+        """(applicants with a preference, applicants placed in their preferred building)."""
+        asked = sum(1 for a in self.assignments if a.application['preferred_building_id'])
+        asked += sum(1 for application in self.unassigned if application['preferred_building_id'])
+        honoured = sum(1 for a in self.assignments if a.application['preferred_building_id'] == a.building_id)
+        return asked, honoured
+
+    def building_stats(self):
+        """Per building: name, free beds before, beds assigned, free beds after."""
+        assigned = Tally(a.building_id for a in self.assignments)
+        stats = []
+        for building in self.buildings.values():
+            free_after = sum(room.free for room in building.rooms)
+            stats.append({
+                'name': building.name,
+                'gender': building.gender,
+                'free_before': free_after + assigned[building.pk],
+                'assigned': assigned[building.pk],
+                'free_after': free_after,
+            })
+        return stats
+
+
+def _load(lock, application_ids=None, reviewer=None, rooms=True):
+    applications = HousingApplication.objects.filter(status=HousingApplication.Status.PENDING)
+    if application_ids is not None:
+        applications = applications.filter(pk__in=application_ids)
+    if reviewer is not None:
+        # Checked in the locked read itself, so a lease taken after it cannot be overridden.
+        applications = applications.filter(open_to(reviewer))
+    if lock:
+        # Only the application rows (student is a nullable join, which PostgreSQL will not lock). Rooms
+        # stay unlocked: their writes are guarded on what was read here and roll back on a conflict.
+        applications = applications.select_for_update(of=('self',))
+
+    pending = list(
+        applications.order_by('created_at', 'pk').values(
+            'pk', 'name', 'student_id', 'governorate', 'preferred_building_id', 'created_at',
+            gender=F('student__gender'),
+        )
+    )
+    if not rooms:
+        return pending, {}
+    buildings = {
+        pk: _Building(pk, name, gender)
+        for pk, name, gender in Building.objects.order_by('name').values_list('pk', 'name', 'gender')
+    }
+
+    # Genders already living in part-filled rooms of mixed buildings.
+    occupant_genders = defaultdict(set)
+    for room_id, gender in (
+        HousingApplication.objects
+        .filter(status=HousingApplication.Status.ACCEPTED, assigned_room__building__gender='',
+                assigned_room__current_occupants__gt=0)
+        .values_list('assigned_room_id', 'student__gender').distinct()
+    ):
+        occupant_genders[room_id].add(gender or '')
+
+    open_rooms = Room.objects.filter(status=Room.Status.AVAILABLE, current_occupants__lt=F('capacity'))
+    for row in open_rooms.order_by('building_id', 'number').values_list(
+        'pk', 'building_id', 'number', 'capacity', 'current_occupants', 'status',
+    ):
+        building = buildings[row[1]]
+        if building.gender:
+            gender = building.gender
+        else:
+            genders = occupant_genders.get(row[0], set())
+            gender = None if not genders else genders.pop() if len(genders) == 1 else _CONFLICT
+        building.add(_Room(*row, gender))
+    return pending, buildings
+
+
+def _pack(group, gender, candidates):
+    """
+    Best-fit-decreasing placement of one group. Returns the assignments,
+    the buildings used and the members left without a bed.
+    """
+    assignments, used = [], set()
+    remaining = list(group)
+    while remaining:
+        fits = [(free, b.pk, b) for b in candidates if (free := b.compatible_free(gender)) > 0]
+        if not fits:
+            break
+        tight = [fit for fit in fits if fit[0] >= len(remaining)]
+        _, _, building = min(tight) if tight else max(fits)
+        placed = building.place(remaining, gender)
+        assignments += placed
+        used.add(building.pk)
+        remaining = remaining[len(placed):]
+    return assignments, used, remaining
+
+
+def plan_allocation(keep_together=True, honour_preferences=True, lock=False):
+    """
+    Match every pending application to a free bed. Nothing is written.
+    With ``lock`` the pending applications read are locked for update
+    (call it inside a transaction).
+    """
+    pending, buildings = _load(lock)
+
+    groups = defaultdict(list)
+    for application in pending:
+        key = (application['gender'] or '', application['governorate'] if keep_together else None)
+        groups[key].append(application)
+
+    assignments, unassigned = [], []
+    kept_together = 0
+    for (gender, _), members in sorted(groups.items(), key=lambda item: -len(item[1])):
+        candidates = [b for b in buildings.values() if b.accepts(gender)]
+        used = set()
+        if honour_preferences:
+            by_preference = defaultdict(list)
+            rest = []
+            for application in members:
+                preferred = buildings.get(application['preferred_building_id'])
+                (by_preference[preferred.pk] if preferred and preferred.accepts(gender) else rest).append(application)
+            for building_id, wanted in by_preference.items():
+                placed = buildings[building_id].place(wanted, gender)
+                if placed:
+                    assignments += placed
+                    used.add(building_id)
+                rest += wanted[len(placed):]
+            members = sorted(rest, key=lambda a: (a['created_at'], a['pk']))
+
+        placed, buildings_used, left = _pack(members, gender, candidates)
+        assignments += placed
+        unassigned += left
+        if len(used | buildings_used) <= 1 and not left:
+            kept_together += 1
+
+    return AllocationPlan(pending, buildings, assignments, unassigned, len(groups), kept_together)
+
+
+def _chunks(items, size=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def apply_allocation(plan):
+    """
+    Write ``plan`` in one transaction. Returns the number of applications
+    accepted; raises ``AllocationConflict`` when the plan is out of date.
+    """
+    return _accept(plan.assignments)
+
+
+def _accept(assignments):
+    if not assignments:
+        return 0
+    Status = HousingApplication.Status
+    with transaction.atomic():
+        # Guarded by what was read, so nothing decided or filled in the meantime is overwritten.
+        accepted = update_rows(
+            HousingApplication, ['status', 'assigned_building', 'assigned_room'],
+            ((a.application['pk'], (Status.ACCEPTED, a.building_id, a.room.pk), (Status.PENDING,)) for a in assignments),
+            guard=['status'],
+        )
+        if accepted != len(assignments):
+            raise AllocationConflict('Some of these applications were decided meanwhile.')
+
+        taken = Tally(a.room.pk for a in assignments)
+        rooms = {a.room.pk: a.room for a in assignments}
+        room_changes = []
+        updated_rooms = []
+        for pk, count in taken.items():
+            room = rooms[pk]
+            occupants = room.occupants + count
+            status = Room.Status.OCCUPIED if occupants >= room.capacity else room.status
+            fields = {'capacity': room.capacity, 'building_id': room.building_id}
+            room_changes.append((
+                {**fields, 'status': room.status, 'current_occupants': room.occupants},
+                {**fields, 'status': status, 'current_occupants': occupants},
+            ))
+            updated_rooms.append((pk, (occupants, status), (room.occupants, room.status, room.capacity)))
+        if update_rows(
+            Room, ['current_occupants', 'status'], updated_rooms, guard=['current_occupants', 'status', 'capacity'],
+        ) != len(updated_rooms):
+            raise AllocationConflict('Some of these rooms changed meanwhile.')
+
+        # Bulk updates skip the save signals: apply what they would have done.
+        counters.record_changes(Room, room_changes)
+        _record_accepted((a.application, a.building_id) for a in assignments)
+        building_ids = {a.building_id for a in assignments}
+        transaction.on_commit(lambda: availability.invalidate(building_ids))
+    return len(assignments)
+
+
+def _record_accepted(accepted):
+    """
+    Bring what follows an application's save up to date for
+    applications accepted with update(): ``accepted`` holds
+    (application values, building id) pairs.
+    """
+    Status = HousingApplication.Status
+    accepted = list(accepted)
+    application_ids = [application['pk'] for application, _ in accepted]
+    student_ids = [application['student_id'] for application, _ in accepted if application['student_id']]
+    for chunk in _chunks(student_ids):
+        User.objects.filter(pk__in=chunk).update(is_approved=True)
+    for chunk in _chunks(application_ids):
+        User.objects.filter(current_application__in=chunk).update(current_application_status=Status.ACCEPTED)
+
+    counters.record_changes(HousingApplication, [
+        ({'status': Status.PENDING, 'assigned_building_id': None},
+         {'status': Status.ACCEPTED, 'assigned_building_id': building_id})
+        for _, building_id in accepted
+    ])
+    rollups.record_changes(
+        ({'status': Status.PENDING, 'governorate': application['governorate'], 'created_at': application['created_at']},
+         {'status': Status.ACCEPTED, 'governorate': application['governorate'], 'created_at': application['created_at']})
+        for application, _ in accepted
+    )
+    transaction.on_commit(lambda: (bump_version(STATS_NAMESPACE), bump_version(SCOPE_NAMESPACE)))
+
+
+def accept_application(application, room, reviewer=None):
+    """
+    Accept one application into ``room``, reserving the bed in the same
+    transaction. Raises ``RoomUnavailable`` when the room has no free
+    bed, ``ApplicationNotPending`` when the application was already
+    decided and, with a ``reviewer``, ``ApplicationClaimed`` when
+    another reviewer holds a lease on it; in each case nothing is saved.
+    """
+    Status = HousingApplication.Status
+
+    def accept():
+        # The status guard makes a second accept (or a concurrent one) fail instead of taking another bed.
+        guarded = HousingApplication.objects.filter(pk=application.pk, status=Status.PENDING)
+        if reviewer is not None:
+            guarded = guarded.filter(open_to(reviewer))
+        accepted = guarded.update(status=Status.ACCEPTED, assigned_building=room.building_id, assigned_room=room.pk)
+        if not accepted:
+            status, holder = HousingApplication.objects.values_list('status', 'claimed_by__username').get(pk=application.pk)
+            if status == Status.PENDING:
+                raise ApplicationClaimed(f'Application #{application.pk} is being reviewed by {holder}.')
+            raise ApplicationNotPending(f'Application #{application.pk} is no longer pending.')
+        values = {
+            'pk': application.pk, 'student_id': application.student_id,
+            'governorate': application.governorate, 'created_at': application.created_at,
+        }
+        _record_accepted([(values, room.building_id)])
+
+    allocate(room, accept)
+
+
+def allocate_pending(dry_run=False, **options):
+    """Plan (and unless ``dry_run``, apply) the allocation of every pending application."""
+    with transaction.atomic():
+        plan = plan_allocation(lock=not dry_run, **options)
+        if not dry_run:
+            apply_allocation(plan)
+    return plan
+
+
+Decision = namedtuple('Decision', ['application_id', 'name', 'ok', 'message'])
+
+
+def _reject(applications):
+    Status = HousingApplication.Status
+    with transaction.atomic():
+        rejected = update_rows(
+            HousingApplication, ['status'], ((a['pk'], (Status.REJECTED,), (Status.PENDING,)) for a in applications),
+            guard=['status'],
+        )
+        if rejected != len(applications):
+            raise AllocationConflict('Some of these applications were decided meanwhile.')
+        application_ids = [a['pk'] for a in applications]
+        for chunk in _chunks(application_ids):
+            User.objects.filter(current_application__in=chunk).update(current_application_status=Status.REJECTED)
+        counters.record_changes(HousingApplication, [
+            ({'status': Status.PENDING, 'assigned_building_id': None},
+             {'status': Status.REJECTED, 'assigned_building_id': None})
+            for _ in applications
+        ])
+        rollups.record_changes(
+            ({'status': Status.PENDING, 'governorate': a['governorate'], 'created_at': a['created_at']},
+             {'status': Status.REJECTED, 'governorate': a['governorate'], 'created_at': a['created_at']})
+            for a in applications
+        )
+        transaction.on_commit(lambda: (bump_version(STATS_NAMESPACE), bump_version(SCOPE_NAMESPACE)))
+
+
+def decide_applications(application_ids, accept, building=None, reviewer=None):
+    """
+    Accept (into ``building``, or into the preferred or best-fitting
+    compatible building) or reject the given applications in one
+    transaction. Only pending applications are decided, and with a
+    ``reviewer`` none that another reviewer holds a live queue lease on.
+    Returns a ``Decision`` per requested id, in the order given.
+    """
+    application_ids = list(dict.fromkeys(application_ids))
+    building_id = getattr(building, 'pk', building)
+    try:
+        with transaction.atomic():
+            pending, buildings = _load(lock=True, application_ids=application_ids, reviewer=reviewer, rooms=accept)
+            by_id = {application['pk']: application for application in pending}
+            decisions = {}
+            assignments = []
+            for application in pending:
+                if not accept:
+                    decisions[application['pk']] = Decision(application['pk'], application['name'], True, 'Rejected.')
+                    continue
+                gender = application['gender'] or ''
+                if building_id is not None:
+                    candidates = [buildings[building_id]] if building_id in buildings else []
+                else:
+                    preferred = buildings.get(application['preferred_building_id'])
+                    candidates = [b for b in buildings.values() if b.accepts(gender)]
+                    if preferred and preferred.accepts(gender) and preferred.compatible_free(gender):
+                        candidates = [preferred]
+                placed, _, _ = _pack([application], gender, candidates)
+                if placed:
+                    assignment = placed[0]
+                    assignments.append(assignment)
+                    message = f'Assigned to {assignment.building.name}, room {assignment.room.number}.'
+                elif building_id in buildings and not buildings[building_id].accepts(gender):
+                    message = f'{buildings[building_id].name} does not house this student\'s gender.'
+                else:
+                    target = buildings[building_id].name if building_id in buildings else 'any building'
+                    message = f'No free bed for this student in {target}.'
+                decisions[application['pk']] = Decision(application['pk'], application['name'], bool(placed), message)
+
+            if accept:
+                _accept(assignments)
+            elif pending:
+                _reject(pending)
+    except AllocationConflict as exc:
+        # Decided concurrently by someone else: nothing here was saved.
+        return [Decision(pk, '', False, f'{exc} Nothing was changed; try again.') for pk in application_ids]
+
+    now = timezone.now()
+    skipped = {
+        row[0]: row[1:] for row in HousingApplication.objects
+        .filter(pk__in=[pk for pk in application_ids if pk not in by_id])
+        .values_list('pk', 'name', 'status', 'claimed_by__username', 'claimed_until')
+    }
+    results = []
+    for pk in application_ids:
+        if pk in decisions:
+            results.append(decisions[pk])
+        elif pk in skipped:
+            name, status, reviewer_name, claimed_until = skipped[pk]
+            if status == HousingApplication.Status.PENDING and claimed_until and claimed_until > now:
+                results.append(Decision(pk, name, False, f'Being reviewed by {reviewer_name or "another reviewer"}.'))
+            else:
+                results.append(Decision(pk, name, False, f'Already {HousingApplication.Status(status).label.lower()}.'))
+        else:
+            results.append(Decision(pk, '', False, 'Application not found.'))
+    return results
@@ -0,0 +1,20 @@
+from .models import HousingApplication
+
+
+def get_current_application(request):
+    """
+    Return the logged-in student's current application.
+
+    The application is looked up by the pointer stored on the user and
+    loaded at most once per request; status checks should use
+    ``request.user.current_application_status`` and need no query.
+    """
+    if not hasattr(request, '_current_application'):
+        pk = request.user.current_application_id
+        request._current_application = (
+            HousingApplication.objects
+            .select_related('assigned_building__supervisor', 'assigned_room')
+            .filter(pk=pk)
+            .first()
+        ) if pk else None
+    return request._current_application
@@ -0,0 +1,65 @@
+from django import forms
+
+from housing.models import Building
+
+from .models import HousingApplication
+
+
+class BatchAllocationForm(forms.Form):
+    keep_together = forms.BooleanField(
+        required=False, initial=True, label='Keep students from the same governorate together',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+    honour_preferences = forms.BooleanField(
+        required=False, initial=True, label='Honour preferred buildings',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
+
+class ApplicationFilterForm(forms.Form):
+    ALL = 'all'
+
+    status = forms.ChoiceField(
+        choices=HousingApplication.Status.choices + [(ALL, 'All statuses')], required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    submitted_from = forms.DateField(
+        required=False, label='Submitted from',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+    submitted_to = forms.DateField(
+        required=False, label='Submitted to',
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
+    )
+
+
+
+class IdListField(forms.Field):
+    """A list of primary keys posted under one name (checkboxes)."""
+    widget = forms.MultipleHiddenInput
+    default_error_messages = {'invalid': 'Invalid selection.'}
+
+    def to_python(self, value):
+        try:
+            return [int(pk) for pk in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError(self.error_messages['invalid'], code='invalid')
+
+
+class BulkDecisionForm(forms.Form):
+    """The action bar of the review table."""
+    MAX_APPLICATIONS = 1000
+
+    action = forms.ChoiceField(choices=[('accept', 'Accept'), ('reject', 'Reject')])
+    building = forms.ModelChoiceField(
+        queryset=Building.objects.only('name').order_by('name'), required=False,
+        empty_label='Preferred or best-fitting building',
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'}),
+    )
+    applications = IdListField(error_messages={'required': 'Select at least one application.'})
+
+    def clean_applications(self):
+        ids = self.cleaned_data['applications']
+        if len(ids) > self.MAX_APPLICATIONS:
+            raise forms.ValidationError(f'Select at most {self.MAX_APPLICATIONS} applications at a time.')
+        return ids
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.batch import AllocationConflict, allocate_pending
+
+
+class Command(BaseCommand):
+    help = 'Assign every pending housing application to a free bed in one run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Show the proposed assignment without saving it.')
+        parser.add_argument('--no-keep-together', action='store_true', help='Do not group applicants by governorate.')
+        parser.add_argument('--ignore-preferences', action='store_true', help='Ignore preferred buildings.')
+        parser.add_argument('--show', type=int, default=0, help='List the first N assignments.')
+
+    def handle(self, *args, **options):
+        try:
+            plan = allocate_pending(
+                dry_run=options['dry_run'],
+                keep_together=not options['no_keep_together'],
+                honour_preferences=not options['ignore_preferences'],
+            )
+        except AllocationConflict as exc:
+            raise CommandError(f'{exc} Nothing was saved; run the command again.')
+
+        for assignment in plan.assignments[:options['show']]:
+            application = assignment.application
+            self.stdout.write(
+                f"#{application['pk']} {application['name']} ({application['governorate']}) "
+                f"-> {assignment.building.name} / {assignment.room.number}"
+            )
+
+        self.stdout.write(f"{'Building':<30}{'Free before':>12}{'Assigned':>10}{'Free after':>12}")
+        for row in plan.building_stats():
+            self.stdout.write(f"{row['name']:<30}{row['free_before']:>12}{row['assigned']:>10}{row['free_after']:>12}")
+
+        asked, honoured = plan.preferences
+        verb = 'Would assign' if options['dry_run'] else 'Assigned'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(plan.assignments)} of {len(plan.pending)} pending applications; '
+            f'{len(plan.unassigned)} left without a compatible bed. '
+            f'{plan.groups_kept_together} of {plan.groups} groups kept in one building; '
+            f'{honoured} of {asked} preferences honoured.'
+        ))
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0003_alter_housingapplication_profile_image_and_more'),
+        ('housing', '0005_building_gender'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='housingapplication',
+            name='preferred_building',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='preferred_by', to='housing.building'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0004_preferred_building'),
+        ('housing', '0006_occupancysnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='housingapplication',
+            index=models.Index(fields=['status', 'created_at'], name='application_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='housingapplication',
+            index=models.Index(fields=['created_at'], name='application_created_idx'),
+        ),
+    ]
@@ -34,9 +34,22 @@ class HousingApplication(models.Model):
     
     assigned_building = models.ForeignKey(Building, on_delete=models.SET_NULL, null=True, blank=True)
     assigned_room = models.ForeignKey(Room, on_delete=models.SET_NULL, null=True, blank=True)
+    # Honoured by the batch allocation engine (applications.batch) when the building has a fitting bed.
+    preferred_building = models.ForeignKey(Building, on_delete=models.SET_NULL, null=True, blank=True, related_name='preferred_by')
     
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    # Review queue lease (applications.queue): who is reviewing the application, and until when.
+    claimed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_applications')
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Back the review table (applications.views.application_list), newest first.
+            models.Index(fields=['status', 'created_at'], name='application_status_created_idx'),
+            models.Index(fields=['created_at'], name='application_created_idx'),
+        ]
+
     def __str__(self):
         return f"Application for {self.name}"
 
@@ -0,0 +1,103 @@
+"""
+Review queue.
+
+Reviewers ask for the next application instead of picking one from the
+table. ``claim_next`` hands out the oldest pending application that
+nobody holds a live lease on and leases it to the reviewer for
+``LEASE``; a lease that runs out (the reviewer walked away) makes the
+application claimable again.
+
+The claim is atomic. Databases with ``SKIP LOCKED`` lock the oldest
+free row and skip rows other reviewers are claiming at the same moment,
+so concurrent reviewers never wait on each other. Elsewhere (SQLite)
+the claim is a conditional UPDATE that only succeeds while the row is
+still free; a reviewer who loses the race moves on to the next
+candidate.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import HousingApplication
+
+LEASE = timedelta(minutes=15)
+# Candidates tried per round on databases without SKIP LOCKED.
+CLAIM_WINDOW = 10
+
+
+def _free(now):
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lte=now)
+
+
+def open_to(reviewer, now=None):
+    """Applications nobody but ``reviewer`` holds a live lease on, as a filter."""
+    return _free(now or timezone.now()) | Q(claimed_by=reviewer)
+
+
+def _pending():
+    return HousingApplication.objects.filter(status=HousingApplication.Status.PENDING).order_by('created_at', 'pk')
+
+
+def held_by(reviewer, now=None):
+    """The pending application the reviewer holds a live lease on, if any."""
+    now = now or timezone.now()
+    # Unordered, so the lookup goes through the claimed_by index rather than the whole pending queue.
+    held = _pending().filter(claimed_by=reviewer, claimed_until__gt=now).order_by()[:1]
+    return next(iter(held), None)
+
+
+def claimed_by_other(application, reviewer, now=None):
+    """Whether someone other than ``reviewer`` holds a live lease on ``application``."""
+    now = now or timezone.now()
+    return (
+        application.claimed_until is not None and application.claimed_until > now
+        and application.claimed_by_id != reviewer.pk
+    )
+
+
+def _claim_skip_locked(reviewer, now):
+    with transaction.atomic():
+        application = _pending().filter(_free(now)).select_for_update(skip_locked=True).first()
+        if application is not None:
+            # A lease is not a review decision: update() keeps the application save signals out of it.
+            HousingApplication.objects.filter(pk=application.pk).update(claimed_by=reviewer, claimed_until=now + LEASE)
+            application.claimed_by, application.claimed_until = reviewer, now + LEASE
+        return application
+
+
+def _claim_conditional(reviewer, now):
+    while True:
+        candidates = list(_pending().filter(_free(now)).values_list('pk', flat=True)[:CLAIM_WINDOW])
+        if not candidates:
+            return None
+        for pk in candidates:
+            # Re-checks the lease in the WHERE clause: only one reviewer's UPDATE can match.
+            claimed = _pending().filter(_free(now), pk=pk).update(claimed_by=reviewer, claimed_until=now + LEASE)
+            if claimed:
+                return HousingApplication.objects.select_related('student').get(pk=pk)
+
+
+def claim_next(reviewer):
+    """
+    Lease the reviewer's next application and return it, or ``None``
+    when no pending application is free. A reviewer who still holds a
+    live lease gets that application back, with the lease renewed.
+    """
+    now = timezone.now()
+    current = held_by(reviewer, now)
+    if current is not None:
+        HousingApplication.objects.filter(pk=current.pk).update(claimed_until=now + LEASE)
+        current.claimed_until = now + LEASE
+        return current
+    if connection.features.has_select_for_update_skip_locked:
+        return _claim_skip_locked(reviewer, now)
+    return _claim_conditional(reviewer, now)
+
+
+def release(application, reviewer):
+    """Give the reviewer's lease on ``application`` back to the queue."""
+    return HousingApplication.objects.filter(pk=application.pk, claimed_by=reviewer).update(
+        claimed_by=None, claimed_until=None,
+    )
@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import HousingApplication
+
+User = get_user_model()
+
+
+def refresh_current_application(student_ids):
+    """Point each student at their latest application, in one UPDATE."""
+    latest = HousingApplication.objects.filter(student=OuterRef('pk')).order_by('-pk')
+    User.objects.filter(pk__in=student_ids).update(
+        current_application=Subquery(latest.values('pk')[:1]),
+        current_application_status=Coalesce(Subquery(latest.values('status')[:1]), Value('')),
+    )
+
+
+@receiver(post_save, sender=HousingApplication)
+def sync_current_application(sender, instance, created, raw=False, **kwargs):
+    if raw or not instance.student_id:
+        return
+    if created:
+        # A new application always has the highest pk of the student's.
+        User.objects.filter(pk=instance.student_id).update(
+            current_application=instance.pk,
+            current_application_status=instance.status,
+        )
+    else:
+        User.objects.filter(pk=instance.student_id, current_application=instance.pk).update(
+            current_application_status=instance.status,
+        )
+
+
+@receiver(post_delete, sender=HousingApplication)
+def clear_current_application(sender, instance, **kwargs):
+    if instance.student_id:
+        refresh_current_application([instance.student_id])
@@ -0,0 +1,284 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.db.models import Sum
+from django.utils import timezone
+from core.counters import rebuild_counters
+from core.models import ApplicationRollup
+from core.pagination import encode_cursor
+from housing.models import Building, Room
+from .batch import (
+    AllocationConflict, ApplicationClaimed, accept_application, allocate_pending, apply_allocation, plan_allocation,
+)
+from .models import HousingApplication
+from .queue import claim_next, release
+
+User = get_user_model()
+
+
+class CurrentApplicationTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student', password='password', governorate="Ibb")
+
+    def apply(self, **kwargs):
+        return HousingApplication.objects.create(student=self.student, name='S', phone='1', age=20, governorate="Ibb", **kwargs)
+
+    def test_pointer_follows_latest_application(self):
+        first = self.apply()
+        second = self.apply(status=HousingApplication.Status.REJECTED)
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.current_application_id, second.pk)
+        self.assertEqual(self.student.current_application_status, HousingApplication.Status.REJECTED)
+
+        first.status = HousingApplication.Status.ACCEPTED
+        first.save()
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.current_application_status, HousingApplication.Status.REJECTED)
+
+        second.delete()
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.current_application_id, first.pk)
+        self.assertEqual(self.student.current_application_status, HousingApplication.Status.ACCEPTED)
+
+    def test_student_redirects_need_no_application_query(self):
+        self.apply()
+        self.client.force_login(self.student)
+        # Session and user lookups only.
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('home'))
+        self.assertRedirects(response, reverse('register_success'), fetch_redirect_response=False)
+
+
+class BatchAllocationTests(TestCase):
+    def setUp(self):
+        self.men = Building.objects.create(name='Men', address='Campus', gender=Building.Gender.MALE)
+        self.women = Building.objects.create(name='Women', address='Campus', gender=Building.Gender.FEMALE)
+        self.mixed = Building.objects.create(name='Mixed', address='Campus')
+        for building in (self.men, self.women, self.mixed):
+            for n in range(1, 4):
+                Room.objects.create(building=building, number=f'{n}', capacity=2)
+
+    def apply(self, gender, governorate, **kwargs):
+        student = User.objects.create_user(
+            username=f'{gender}{User.objects.count()}', password='password', governorate=governorate, gender=gender,
+        )
+        return HousingApplication.objects.create(
+            student=student, name='S', phone='1', age=20, governorate=governorate, **kwargs,
+        )
+
+    def test_constraints_and_derived_data(self):
+        for _ in range(5):
+            self.apply('M', 'Ibb')
+        for _ in range(4):
+            self.apply('F', 'Amran')
+        self.apply('F', 'Ibb', preferred_building=self.mixed)
+
+        plan = allocate_pending()
+        self.assertEqual((len(plan.assignments), len(plan.unassigned)), (10, 0))
+
+        accepted = HousingApplication.objects.filter(status=HousingApplication.Status.ACCEPTED)
+        self.assertEqual(accepted.count(), 10)
+        self.assertFalse(accepted.filter(student__gender='M', assigned_building=self.women).exists())
+        self.assertFalse(accepted.filter(student__gender='F', assigned_building=self.men).exists())
+        for room in Room.objects.all():
+            genders = set(accepted.filter(assigned_room=room).values_list('student__gender', flat=True))
+            self.assertLessEqual(len(genders), 1)
+            self.assertLessEqual(room.current_occupants, room.capacity)
+            self.assertEqual(room.current_occupants, accepted.filter(assigned_room=room).count())
+        self.assertEqual(set(accepted.filter(governorate='Amran').values_list('assigned_building', flat=True)), {self.women.pk})
+        self.assertEqual(accepted.get(governorate='Ibb', student__gender='F').assigned_building, self.mixed)
+
+        self.assertEqual(rebuild_counters(), 0)
+        self.assertEqual(
+            ApplicationRollup.objects.filter(period='month', status='accepted').aggregate(total=Sum('count'))['total'], 10,
+        )
+        self.assertEqual(User.objects.filter(current_application_status='accepted', is_approved=True).count(), 10)
+
+    def test_full_campus_and_dry_run(self):
+        for _ in range(8):
+            self.apply('M', 'Ibb')
+        plan = allocate_pending(dry_run=True)
+        # Six beds in the men's building and six in the mixed one.
+        self.assertEqual((len(plan.assignments), len(plan.unassigned)), (8, 0))
+        self.assertFalse(HousingApplication.objects.filter(status=HousingApplication.Status.ACCEPTED).exists())
+        self.assertFalse(Room.objects.filter(current_occupants__gt=0).exists())
+
+    def test_stale_plan_saves_nothing(self):
+        first, second = self.apply('M', 'Ibb'), self.apply('M', 'Ibb')
+        plan = plan_allocation()
+        second.status = HousingApplication.Status.REJECTED  # Another reviewer, meanwhile.
+        second.save()
+        with self.assertRaises(AllocationConflict):
+            apply_allocation(plan)
+        self.assertEqual(HousingApplication.objects.get(pk=first.pk).status, HousingApplication.Status.PENDING)
+        self.assertFalse(Room.objects.filter(current_occupants__gt=0).exists())
+
+        plan = plan_allocation()
+        Room.objects.filter(pk=plan.assignments[0].room.pk).update(current_occupants=1)
+        with self.assertRaises(AllocationConflict):
+            apply_allocation(plan)
+        self.assertEqual(HousingApplication.objects.get(pk=first.pk).status, HousingApplication.Status.PENDING)
+
+
+class ReviewTableTests(TestCase):
+    def setUp(self):
+        self.building = Building.objects.create(name='Women', address='Campus', gender=Building.Gender.FEMALE)
+        Building.objects.create(name='Men', address='Campus', gender=Building.Gender.MALE)
+        self.room = Room.objects.create(building=self.building, number='101', capacity=2)
+        self.admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(self.admin)
+
+    def apply(self, count, status=HousingApplication.Status.PENDING):
+        HousingApplication.objects.bulk_create(
+            HousingApplication(name=f'S{n}', phone='1', age=20, governorate="Ibb", status=status) for n in range(count)
+        )
+
+    def test_pages_pending_first(self):
+        self.apply(60)
+        self.apply(3, HousingApplication.Status.REJECTED)
+        url = reverse('application_list')
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['applications']), 50)
+        self.assertEqual({app.status for app in response.context['applications']}, {'pending'})
+        response = self.client.get(url + response.context['next_url'])
+        self.assertEqual(len(response.context['applications']), 10)
+        self.assertIsNone(response.context['next_url'])
+
+        response = self.client.get(url, {'status': 'rejected'})
+        self.assertEqual(len(response.context['applications']), 3)
+        today = timezone.localdate()
+        self.assertEqual(len(self.client.get(url, {'status': 'all', 'submitted_to': today}).context['applications']), 50)
+        self.assertEqual(len(self.client.get(url, {'submitted_from': today + timedelta(days=1)}).context['applications']), 0)
+
+    def test_tampered_cursor_means_the_first_page(self):
+        self.apply(3)
+        url = reverse('application_list')
+        first = list(self.client.get(url).context['applications'])
+        for values in (['abc', 'x'], ['2024-13-45T00:00:00', 1]):
+            response = self.client.get(url, {'cursor': encode_cursor('next', values)})
+            self.assertEqual(list(response.context['applications']), first)
+
+    def test_accept_dialog_is_fetched(self):
+        student = User.objects.create_user(username='amal', password='password', governorate="Ibb", gender='F')
+        application = HousingApplication.objects.create(student=student, name='Amal', phone='1', age=20, governorate="Ibb")
+        self.assertNotContains(self.client.get(reverse('application_list')), 'building_open_rooms')
+
+        url = reverse('application_accept', args=[application.pk])
+        response = self.client.get(url, {'next': '/applications/list/?status=all'})
+        self.assertContains(response, 'Women (2 free beds)')
+        self.assertNotContains(response, 'Men')
+
+        response = self.client.post(url, {
+            'building': self.building.pk, 'room': self.room.pk, 'next': '/applications/list/?status=all',
+        })
+        self.assertRedirects(response, '/applications/list/?status=all', fetch_redirect_response=False)
+        response = self.client.post(url, {'building': self.building.pk, 'room': self.room.pk, 'next': 'https://evil.example/'})
+        self.assertRedirects(response, reverse('application_list'), fetch_redirect_response=False)
+        self.assertContains(self.client.get(url), 'already accepted')
+
+    def test_bulk_decisions(self):
+        women = [
+            HousingApplication.objects.create(
+                student=User.objects.create_user(username=f'w{n}', password='password', governorate="Ibb", gender='F'),
+                name=f'W{n}', phone='1', age=20, governorate="Ibb",
+            )
+            for n in range(3)
+        ]
+        man = HousingApplication.objects.create(
+            student=User.objects.create_user(username='m', password='password', governorate="Ibb", gender='M'),
+            name='M', phone='1', age=20, governorate="Ibb",
+        )
+        url = reverse('application_bulk')
+        ids = [app.pk for app in women] + [man.pk, 9999]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'action': 'accept', 'building': self.building.pk, 'applications': ids})
+        results = response.context['results']
+        self.assertEqual([result.ok for result in results], [True, True, False, False, False])
+        self.assertIn('No free bed', results[2].message)
+        self.assertIn('does not house', results[3].message)
+        self.assertEqual(results[4].message, 'Application not found.')
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.current_occupants, self.room.status), (2, Room.Status.OCCUPIED))
+        self.assertTrue(User.objects.get(username='w0').is_approved)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'action': 'reject', 'applications': [women[0].pk, women[2].pk, man.pk]})
+        self.assertEqual([result.ok for result in response.context['results']], [False, True, True])
+        self.assertEqual(response.context['results'][0].message, 'Already accepted.')
+        self.assertEqual(User.objects.get(username='m').current_application_status, HousingApplication.Status.REJECTED)
+        self.assertEqual(rebuild_counters(), 0)
+
+        response = self.client.post(url, {'action': 'reject', 'applications': ['x']})
+        self.assertRedirects(response, reverse('application_list'), fetch_redirect_response=False)
+
+    def test_reject_leaves_decided_applications_alone(self):
+        application = HousingApplication.objects.create(name='S', phone='1', age=20, governorate="Ibb")
+        self.client.post(reverse('application_accept', args=[application.pk]), {'building': self.building.pk, 'room': self.room.pk})
+        response = self.client.post(reverse('application_reject', args=[application.pk]), follow=True)
+        self.assertContains(response, 'Already accepted.')
+        application.refresh_from_db()
+        self.room.refresh_from_db()
+        self.assertEqual((application.status, application.assigned_room), (HousingApplication.Status.ACCEPTED, self.room))
+        self.assertEqual(self.room.current_occupants, 1)
+        self.assertEqual(rebuild_counters(), 0)
+
+
+class ReviewQueueTests(TestCase):
+    def setUp(self):
+        self.first = User.objects.create_superuser(username='first', password='password', governorate="Sana'a")
+        self.second = User.objects.create_superuser(username='second', password='password', governorate="Sana'a")
+        self.oldest, self.middle, self.newest = [
+            HousingApplication.objects.create(name=f'S{n}', phone='1', age=20, governorate="Ibb") for n in range(3)
+        ]
+
+    def test_reviewers_never_share_an_application(self):
+        self.assertEqual(claim_next(self.first), self.oldest)
+        self.assertEqual(claim_next(self.second), self.middle)
+        # A reviewer holding a lease gets it back instead of a new one.
+        self.assertEqual(claim_next(self.first), self.oldest)
+
+        release(self.oldest, self.first)
+        self.assertEqual(claim_next(self.first), self.oldest)
+
+        HousingApplication.objects.filter(pk=self.middle.pk).update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.oldest.status = HousingApplication.Status.REJECTED
+        self.oldest.save()
+        self.assertEqual(claim_next(self.first), self.middle)  # The expired lease is claimable again.
+        self.assertEqual(claim_next(self.second), self.newest)
+        HousingApplication.objects.filter(pk=self.newest.pk).update(status=HousingApplication.Status.REJECTED)
+        self.assertIsNone(claim_next(self.second))
+
+    def test_decisions_respect_leases(self):
+        self.client.force_login(self.first)
+        response = self.client.post(reverse('application_claim_next'))
+        self.assertRedirects(response, reverse('application_detail', args=[self.oldest.pk]), fetch_redirect_response=False)
+
+        self.client.force_login(self.second)
+        self.client.post(reverse('application_reject', args=[self.oldest.pk]))
+        self.oldest.refresh_from_db()
+        self.assertEqual(self.oldest.status, HousingApplication.Status.PENDING)
+        response = self.client.post(reverse('application_bulk'), {'action': 'reject', 'applications': [self.oldest.pk, self.middle.pk]})
+        self.assertEqual([r.message for r in response.context['results']], ['Being reviewed by first.', 'Rejected.'])
+
+        self.client.force_login(self.first)
+        self.client.post(reverse('application_reject', args=[self.oldest.pk]))
+        self.oldest.refresh_from_db()
+        self.assertEqual(self.oldest.status, HousingApplication.Status.REJECTED)
+
+    def test_accept_respects_a_lease_taken_after_loading(self):
+        room = Room.objects.create(building=Building.objects.create(name='B', address='Campus'), number='1', capacity=1)
+        stale = HousingApplication.objects.get(pk=self.oldest.pk)
+        claim_next(self.first)
+        with self.assertRaisesMessage(ApplicationClaimed, 'being reviewed by first'):
+            accept_application(stale, room, reviewer=self.second)
+        room.refresh_from_db()
+        self.assertEqual(room.current_occupants, 0)
+
+        accept_application(stale, room, reviewer=self.first)
+        room.refresh_from_db()
+        self.assertEqual(room.current_occupants, 1)
+        self.assertEqual(rebuild_counters(), 0)
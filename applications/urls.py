@@ -1,9 +1,16 @@
 from django.urls import path
-from .views import application_list, application_accept, application_reject, application_detail
+from .views import (
+    application_list, application_accept, application_reject, application_detail, application_allocate, application_bulk,
+    application_claim_next, application_release,
+)
 
 urlpatterns = [
     path('list/', application_list, name='application_list'),
+    path('allocate/', application_allocate, name='application_allocate'),
+    path('bulk/', application_bulk, name='application_bulk'),
+    path('next/', application_claim_next, name='application_claim_next'),
     path('<int:pk>/accept/', application_accept, name='application_accept'),
     path('<int:pk>/reject/', application_reject, name='application_reject'),
+    path('<int:pk>/release/', application_release, name='application_release'),
     path('<int:pk>/', application_detail, name='application_detail'),
 ]
@@ -1,7 +1,19 @@
+from datetime import datetime, time, timedelta
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
+from core.pagination import paginate
+from .batch import (
+    AllocationConflict, ApplicationClaimed, ApplicationNotPending, accept_application, allocate_pending, decide_applications,
+)
+from .forms import ApplicationFilterForm, BatchAllocationForm, BulkDecisionForm
 from .models import HousingApplication
+from .queue import claim_next, claimed_by_other, release
+from housing.allocation import RoomUnavailable
+from housing.availability import free_beds_by_building
 from housing.models import Building, Room
 
 def is_admin_or_supervisor(user):
@@ -10,17 +22,71 @@ def is_admin_or_supervisor(user):
 def is_admin(user):
     return user.role == 'ADMIN'
 
+REVIEW_ORDERING = ('-created_at', '-id')
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _safe_next(request):
+    """The review page an action was posted from, if it is a local URL."""
+    target = request.POST.get('next')
+    if target and url_has_allowed_host_and_scheme(target, {request.get_host()}, request.is_secure()):
+        return target
+    return None
+
+
+def _back(request):
+    """Where to return after acting on an application: the review page it was opened from."""
+    return redirect(_safe_next(request) or 'application_list')
+
+
 @login_required
 @user_passes_test(is_admin_or_supervisor)
 def application_list(request):
-    applications = HousingApplication.objects.select_related('student', 'assigned_building', 'assigned_room').order_by('-created_at')
-    buildings = Building.objects.prefetch_related('rooms').all()
-    return render(request, 'housing/application_list.html', {'applications': applications, 'buildings': buildings})
+    """
+    Review table of applications, one keyset page at a time.
+
+    Shows pending applications unless another status (or all) is chosen,
+    newest first, optionally limited to a submission date range; the
+    (status, created_at) index keeps every page as cheap as the first.
+    The accept dialog's form is fetched from application_accept when
+    the dialog opens.
+    """
+    form = ApplicationFilterForm(request.GET or None)
+    filters = form.cleaned_data if form.is_valid() else {}
+
+    applications = HousingApplication.objects.select_related('student', 'assigned_building', 'assigned_room', 'claimed_by')
+    status = filters.get('status') or HousingApplication.Status.PENDING
+    if status != ApplicationFilterForm.ALL:
+        applications = applications.filter(status=status)
+    # Bounds on the raw timestamp (not __date) so the index is used.
+    if filters.get('submitted_from'):
+        applications = applications.filter(created_at__gte=_day_start(filters['submitted_from']))
+    if filters.get('submitted_to'):
+        applications = applications.filter(created_at__lt=_day_start(filters['submitted_to'] + timedelta(days=1)))
+
+    page = paginate(applications, REVIEW_ORDERING, request.GET.get('cursor'))
+
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    page_url = lambda cursor: f"?{params.urlencode() + '&' if params else ''}cursor={cursor}"
+    return render(request, 'housing/application_list.html', {
+        'applications': page,
+        'form': form,
+        'bulk_form': BulkDecisionForm() if request.user.role == 'ADMIN' else None,
+        'now': timezone.now(),
+        'status': status,
+        'filtered': any(filters.values()),
+        'next_url': page_url(page.next_cursor) if page.has_next else None,
+        'previous_url': page_url(page.previous_cursor) if page.has_previous else None,
+    })
 
 @login_required
 @user_passes_test(is_admin)
 def application_accept(request, pk):
-    """Accept an application and assign a room"""
+    """Accept an application and assign a room; GET renders the form for the accept dialog."""
     application = get_object_or_404(HousingApplication, pk=pk)
     
     if request.method == 'POST':
@@ -29,37 +95,37 @@ def application_accept(request, pk):
         
         if not building_id or not room_id:
             messages.error(request, 'Please select both building and room.')
-            return redirect('application_list')
+            return _back(request)
         
         building = get_object_or_404(Building, pk=building_id)
-        room = get_object_or_404(Room, pk=room_id)
-        
-        # Check if room has capacity
-        if room.current_occupants >= room.capacity:
+        room = get_object_or_404(Room.objects.select_related('building'), pk=room_id, building=building)
+
+        # Reserves the bed (capacity guard in SQL) and accepts in one transaction
+        try:
+            accept_application(application, room, reviewer=request.user)
+        except RoomUnavailable:
             messages.error(request, 'Selected room is full.')
-            return redirect('application_list')
-        
- 
-        application.status = HousingApplication.Status.ACCEPTED
-        application.assigned_building = building
-        application.assigned_room = room
-        application.save()
-        
-        # Update room occupancy
-        room.current_occupants += 1
-        if room.current_occupants >= room.capacity:
-            room.status = Room.Status.OCCUPIED
-        room.save()
-        
-        # Approve the user account
-        if application.student:
-            application.student.is_approved = True
-            application.student.save()
-        
+            return _back(request)
+        except ApplicationClaimed as exc:
+            messages.error(request, str(exc))
+            return _back(request)
+        except ApplicationNotPending:
+            application.refresh_from_db(fields=['status'])
+            messages.error(request, f'Application #{application.id} is already {application.get_status_display().lower()}.')
+            return _back(request)
+
         messages.success(request, f'Application #{application.id} accepted. Student assigned to {room}.')
-        return redirect('application_list')
-    
-    return redirect('application_list')
+        return _back(request)
+
+    # GET: the body of the accept dialog, loaded when the dialog opens.
+    gender = application.student.gender if application.student else ''
+    buildings = {
+        pk: building for pk, building in free_beds_by_building().items()
+        if not building['gender'] or building['gender'] == gender
+    }
+    return render(request, 'housing/application_accept_form.html', {
+        'application': application, 'buildings': buildings, 'next': request.GET.get('next', ''),
+    })
 
 @login_required
 @user_passes_test(is_admin)
@@ -68,17 +134,111 @@ def application_reject(request, pk):
     application = get_object_or_404(HousingApplication, pk=pk)
     
     if request.method == 'POST':
-        application.status = HousingApplication.Status.REJECTED
-        application.save()
-        
+        # Decided like a bulk reject, so the pending and lease checks happen in the locked read.
+        [result] = decide_applications([application.pk], accept=False, reviewer=request.user)
+        if not result.ok:
+            messages.error(request, f'Application #{application.id} was not rejected: {result.message}')
+            return _back(request)
+
         messages.success(request, f'Application #{application.id} rejected.')
-        return redirect('application_list')
+        return _back(request)
     
     return redirect('application_list')
 
+@login_required
+@user_passes_test(is_admin)
+def application_bulk(request):
+    """
+    Accept or reject the applications selected in the review table in
+    one transaction, and list the outcome for each of them.
+    """
+    if request.method != 'POST':
+        return redirect('application_list')
+    form = BulkDecisionForm(request.POST)
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+        return _back(request)
+
+    accept = form.cleaned_data['action'] == 'accept'
+    results = decide_applications(
+        form.cleaned_data['applications'], accept, form.cleaned_data['building'], reviewer=request.user,
+    )
+    done = sum(1 for result in results if result.ok)
+    return render(request, 'housing/application_bulk_result.html', {
+        'results': results,
+        'action': 'accepted' if accept else 'rejected',
+        'done': done,
+        'failed': len(results) - done,
+        'back': _safe_next(request),
+    })
+
 @login_required
 @user_passes_test(is_admin)
 def application_detail(request, pk):
     """View application details including student info and photos"""
+    application = get_object_or_404(
+        HousingApplication.objects.select_related('student', 'assigned_building', 'assigned_room', 'claimed_by'), pk=pk,
+    )
+    held = (
+        application.status == HousingApplication.Status.PENDING and application.claimed_by_id == request.user.pk
+        and application.claimed_until is not None and application.claimed_until > timezone.now()
+    )
+    return render(request, 'housing/application_detail.html', {
+        'application': application,
+        'claimed_by_other': claimed_by_other(application, request.user),
+        'held': held,
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+def application_claim_next(request):
+    """
+    Lease the oldest pending application nobody else is reviewing to the
+    current reviewer and open it. A reviewer still holding one is sent
+    back to it; they decide or release it first.
+    """
+    if request.method != 'POST':
+        return redirect('application_list')
+    application = claim_next(request.user)
+    if application is None:
+        messages.info(request, 'No pending applications are waiting for review.')
+        return redirect('application_list')
+    return redirect('application_detail', pk=application.pk)
+
+
+@login_required
+@user_passes_test(is_admin)
+def application_release(request, pk):
+    """Return the reviewer's lease on an application to the queue."""
     application = get_object_or_404(HousingApplication, pk=pk)
-    return render(request, 'housing/application_detail.html', {'application': application})
+    if request.method == 'POST' and release(application, request.user):
+        messages.info(request, f'Application #{application.id} returned to the queue.')
+    return redirect('application_list')
+
+@login_required
+@user_passes_test(is_admin)
+def application_allocate(request):
+    """
+    Assign every pending application to a free bed in one run.
+
+    'Preview' shows the proposed assignment and fill statistics without
+    saving; 'Allocate' plans again and saves the result.
+    """
+    plan = None
+    form = BatchAllocationForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        dry_run = request.POST.get('action') != 'allocate'
+        try:
+            plan = allocate_pending(dry_run=dry_run, **form.cleaned_data)
+        except AllocationConflict as exc:
+            messages.error(request, f'{exc} Nothing was saved; allocate again.')
+            return redirect('application_allocate')
+        if not dry_run:
+            messages.success(request, f'{len(plan.assignments)} applications accepted and assigned to rooms.')
+            if plan.unassigned:
+                messages.warning(request, f'{len(plan.unassigned)} applications had no compatible free bed.')
+            return redirect('application_list')
+    return render(request, 'housing/application_allocate.html', {'form': form, 'plan': plan})
@@ -1,5 +1,23 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def seed_aggregates(sender, **kwargs):
+    """Build the counter and rollup tables the first time they are migrated into place."""
+    from .counters import rebuild_counters
+    from .models import ApplicationRollup, Counter
+    from .rollups import backfill_rollups
+
+    if not Counter.objects.exists():
+        rebuild_counters()
+    if not ApplicationRollup.objects.exists():
+        backfill_rollups()
+
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        post_migrate.connect(seed_aggregates, sender=self)
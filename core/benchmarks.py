@@ -0,0 +1,117 @@
+"""
+View benchmarks.
+
+``run_benchmarks`` requests each view in ``VIEWS`` through the Django
+test client against the current database and records latency
+percentiles, query counts and response sizes. ``compare`` checks a
+result set against a stored baseline; ``format_report`` renders the
+comparison as a table. The ``benchmark_views`` command ties these
+together over seeded datasets of increasing size.
+"""
+import math
+import time
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+# (url name, role the request is made as)
+VIEWS = [
+    ('room_list', 'ADMIN'),
+    ('building_list', 'ADMIN'),
+    ('application_list', 'ADMIN'),
+    ('user_list', 'ADMIN'),
+    ('payment_list', 'ADMIN'),
+    ('complaint_list', 'ADMIN'),
+    ('service_list', 'ADMIN'),
+    ('admin_dashboard', 'ADMIN'),
+    ('supervisor_dashboard', 'SUPERVISOR'),
+    ('student_dashboard', 'STUDENT'),
+]
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def benchmark_view(client, url, repeat):
+    client.get(url, secure=True)  # Warm up caches and templates.
+    timings = []
+    queries = 0
+    size = 0
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url, secure=True)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = max(queries, len(captured))
+        size = len(content)
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': queries,
+        'bytes': size,
+    }
+
+
+def run_benchmarks(users, repeat=5, views=VIEWS):
+    """
+    Benchmark every view as the given ``{role: user}``; returns
+    ``{url name: measurements}``.
+    """
+    results = {}
+    for name, role in views:
+        client = Client()
+        client.force_login(users[role])
+        results[name] = benchmark_view(client, reverse(name), repeat)
+    return results
+
+
+def compare(results, baseline, tolerance=0.25, min_delta_ms=5.0):
+    """
+    Compare ``{size: {view: measurements}}`` with a baseline of the same
+    shape. A view regresses when its p95 grows by more than ``tolerance``
+    (and by at least ``min_delta_ms``, to ignore noise on fast views) or
+    when it runs more queries than before.
+    """
+    rows = []
+    for size, views in results.items():
+        for view, current in views.items():
+            previous = baseline.get(size, {}).get(view)
+            row = {'size': size, 'view': view, 'current': current, 'baseline': previous, 'regressions': []}
+            if previous:
+                slower = current['p95_ms'] - previous['p95_ms']
+                if slower > min_delta_ms and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+                    row['regressions'].append(f"p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+                if current['queries'] > previous['queries']:
+                    row['regressions'].append(f"queries {previous['queries']} -> {current['queries']}")
+            rows.append(row)
+    return rows
+
+
+def format_report(rows):
+    header = f"{'size':>8}  {'view':<22}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'KB':>9}{'base p95':>10}  status"
+    lines = [header, '-' * len(header)]
+    for row in rows:
+        current, previous = row['current'], row['baseline']
+        if previous is None:
+            status = 'new'
+        elif row['regressions']:
+            status = 'REGRESSION: ' + '; '.join(row['regressions'])
+        else:
+            status = 'ok'
+        base = f"{previous['p95_ms']:.1f}" if previous else '-'
+        lines.append(
+            f"{row['size']:>8}  {row['view']:<22}{current['p50_ms']:>10.1f}{current['p95_ms']:>10.1f}"
+            f"{current['queries']:>9}{current['bytes'] / 1024:>9.0f}{base:>10}  {status}"
+        )
+    regressions = sum(1 for row in rows if row['regressions'])
+    lines.append(f'{regressions} regression(s) in {len(rows)} measurements.')
+    return '\n'.join(lines)
@@ -0,0 +1,72 @@
+"""
+Bulk writes through ``executemany``.
+
+Django's ``bulk_update`` builds a CASE expression per field with a WHEN
+per row; for thousands of rows compiling that costs far more than the
+database spends running it. These helpers send one parameterised
+statement with a row of parameters per object instead. They bypass
+signals like ``bulk_update`` does, and run inside the caller's
+transaction.
+"""
+from django.db import connections, router
+
+
+def _connection(model):
+    return connections[router.db_for_write(model)]
+
+
+def update_rows(model, fields, rows, guard=()):
+    """
+    Set ``fields`` on each row. ``rows`` is an iterable of
+    ``(pk, values)`` with ``values`` in the order of ``fields``; foreign
+    keys are given by field name and take a pk. With ``guard`` field
+    names, rows are ``(pk, values, expected)`` and a row is only updated
+    while those fields still hold ``expected``. Returns the number of
+    rows updated.
+    """
+    connection = _connection(model)
+    model_fields = [model._meta.get_field(name) for name in fields]
+    guard_fields = [model._meta.get_field(name) for name in guard]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {}'.format(
+        quote(model._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in model_fields),
+        ' AND '.join(f'{quote(field.column)} = %s' for field in [model._meta.pk, *guard_fields]),
+    )
+    params = []
+    for pk, values, *expected in rows:
+        row = [field.get_db_prep_save(value, connection) for field, value in zip(model_fields, values)] + [pk]
+        if guard_fields:
+            row += [field.get_db_prep_save(value, connection) for field, value in zip(guard_fields, expected[0])]
+        params.append(row)
+    if not params:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+        return cursor.rowcount
+
+
+def increment_rows(model, field, key_fields, deltas):
+    """
+    Add ``amount`` to ``field`` of the row matching each ``key`` in the
+    ``{key: amount}`` mapping, where a key holds the values of
+    ``key_fields``. The addition happens in SQL, so concurrent writers
+    never lose an update. Rows must already exist.
+    """
+    connection = _connection(model)
+    target = model._meta.get_field(field)
+    keys = [model._meta.get_field(name) for name in key_fields]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {table} SET {column} = {column} + %s WHERE {where}'.format(
+        table=quote(model._meta.db_table),
+        column=quote(target.column),
+        where=' AND '.join(f'{quote(key.column)} = %s' for key in keys),
+    )
+    params = [
+        [amount] + [key.get_db_prep_value(value, connection) for key, value in zip(keys, values)]
+        for values, amount in deltas.items()
+        if amount
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
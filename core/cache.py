@@ -0,0 +1,50 @@
+"""
+Versioned cache namespaces.
+
+Cached snapshots are stored under keys that embed a namespace version.
+Writers never delete cached entries; they bump the version instead, so
+every key built from the old version is simply never read again and
+expires on its own.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'core:version:{namespace}'
+
+
+def get_version(namespace):
+    """Return the current version number of a cache namespace."""
+    key = VERSION_KEY.format(namespace=namespace)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock so a version key evicted from the cache can
+        # never fall back to a number older snapshots were stored under.
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every snapshot stored in the namespace."""
+    key = VERSION_KEY.format(namespace=namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        return get_version(namespace)
+
+
+def versioned_key(namespace, *parts):
+    """Build a cache key bound to the current version of the namespace."""
+    suffix = ':'.join(str(part) for part in parts)
+    return f'core:{namespace}:{get_version(namespace)}:{suffix}'
+
+
+def get_or_set(namespace, parts, compute, timeout):
+    """Return the cached value for ``parts`` or store ``compute()``."""
+    key = versioned_key(namespace, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PER_PROCESS_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """The versioned namespaces in core.cache are only invalidated in the cache they are bumped in."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend not in PER_PROCESS_CACHES:
+        return []
+    return [Warning(
+        'The default cache is private to each process, so with several workers the dashboards '
+        'keep serving data other workers have already invalidated.',
+        hint='Set DJANGO_REDIS_URL (or DJANGO_CACHE_TABLE) so every worker shares one cache.',
+        id='core.W001',
+    )]
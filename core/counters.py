@@ -0,0 +1,235 @@
+"""
+Event-driven counter store.
+
+Every counted model has a spec: a name prefix, the field it is broken
+down by, the path to its building and the fields whose values are
+summed. An instance contributes to these counters:
+
+    <prefix>                 number of rows
+    <prefix>.<group value>   number of rows per status / role
+    <prefix>.<sum field>     total of a numeric field
+
+in the global scope and, when it belongs to a building, in that
+building's scope and the building supervisor's scope.
+
+Signal handlers apply the difference between an instance's state when it
+was loaded and its state after a save (or its removal on delete) with
+F() increments. Deleting a room or building unlinks its complaints and
+applications (``on_delete=SET_NULL``) in one UPDATE without signals, so
+``record_unlink`` is called for them before the delete.
+``rebuild_counters`` recomputes everything with grouped queries and
+replaces the table, which fixes drift left by queryset ``update()``
+calls that bypass signals.
+"""
+from collections import Counter as Tally, namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from accounts.models import CustomUser
+from applications.models import HousingApplication
+from complaints.models import Complaint
+from housing.models import Building, Room
+
+from .models import Counter
+from .tracking import StateTracker
+
+Scope = Counter.Scope
+
+CounterSpec = namedtuple('CounterSpec', ['prefix', 'group_field', 'building_path', 'sum_fields'])
+
+SPECS = {
+    CustomUser: CounterSpec('users', 'role', None, ()),
+    HousingApplication: CounterSpec('applications', 'status', 'assigned_building', ()),
+    Complaint: CounterSpec('complaints', 'status', 'room__building', ()),
+    Room: CounterSpec('rooms', 'status', 'building', ('capacity', 'current_occupants')),
+}
+
+
+def _tracked_fields(spec):
+    fields = [spec.group_field, *spec.sum_fields]
+    if spec.building_path:
+        fields.append(spec.building_path.split('__')[0] + '_id')
+    return fields
+
+
+tracker = StateTracker('_counter_state', lambda model: _tracked_fields(SPECS[model]))
+
+
+def _scopes(spec, state):
+    """Return the (scope, scope_id) pairs an instance state counts towards."""
+    scopes = [(Scope.GLOBAL, 0)]
+    if not spec.building_path:
+        return scopes
+
+    link = state[spec.building_path.split('__')[0] + '_id']
+    if link is None:
+        return scopes
+    if spec.building_path == 'room__building':
+        row = Room.objects.filter(pk=link).values_list('building_id', 'building__supervisor_id').first()
+    else:
+        row = (link, Building.objects.filter(pk=link).values_list('supervisor_id', flat=True).first())
+    if row is None:
+        return scopes
+
+    building_id, supervisor_id = row
+    scopes.append((Scope.BUILDING, building_id))
+    if supervisor_id:
+        scopes.append((Scope.SUPERVISOR, supervisor_id))
+    return scopes
+
+
+def _contributions(spec, state, sign, tally, scopes=None):
+    amounts = {
+        spec.prefix: 1,
+        f'{spec.prefix}.{state[spec.group_field]}': 1,
+    }
+    for field in spec.sum_fields:
+        amounts[f'{spec.prefix}.{field}'] = state[field] or 0
+    for scope, scope_id in scopes if scopes is not None else _scopes(spec, state):
+        for name, amount in amounts.items():
+            tally[(scope, scope_id, name)] += sign * amount
+
+
+def apply_deltas(tally):
+    """Add each (scope, scope_id, name) -> amount in ``tally`` to its counter."""
+    for (scope, scope_id, name), amount in tally.items():
+        if not amount:
+            continue
+        counters = Counter.objects.filter(scope=scope, scope_id=scope_id, name=name)
+        if not counters.update(value=F('value') + amount):
+            Counter.objects.get_or_create(scope=scope, scope_id=scope_id, name=name)
+            counters.update(value=F('value') + amount)
+
+
+def record_save(instance, created):
+    spec = SPECS[type(instance)]
+    old, new = tracker.saved(instance, created)
+    tally = Tally()
+    if old is not None:
+        _contributions(spec, old, -1, tally)
+    _contributions(spec, new, 1, tally)
+    with transaction.atomic():
+        apply_deltas(tally)
+
+
+def record_delete(instance):
+    spec = SPECS[type(instance)]
+    state = tracker.deleted(instance)
+    if state is None:
+        return
+    tally = Tally()
+    _contributions(spec, state, -1, tally)
+    with transaction.atomic():
+        apply_deltas(tally)
+
+
+def record_changes(model, changes):
+    """
+    Apply the counter difference for rows changed by ``bulk_create`` or
+    queryset ``update()``, which bypass the save signals. ``changes`` is
+    an iterable of ``(old, new)`` states: dicts of the model's tracked
+    fields, ``None`` for a row that did not exist or no longer exists.
+    """
+    spec = SPECS[model]
+    link = spec.building_path.split('__')[0] + '_id' if spec.building_path else None
+    scopes = {}
+    tally = Tally()
+    for old, new in changes:
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None:
+                continue
+            key = state[link] if link else None
+            if key not in scopes:
+                scopes[key] = _scopes(spec, state)
+            _contributions(spec, state, sign, tally, scopes[key])
+    with transaction.atomic():
+        apply_deltas(tally)
+
+
+def record_change(model, old, new):
+    record_changes(model, [(old, new)])
+
+
+def record_unlink(model, target_id):
+    """
+    Move the rows of ``model`` linked to ``target_id`` (a room or
+    building about to be deleted) out of its building and supervisor
+    scopes. Call it while the target still exists.
+    """
+    spec = SPECS[model]
+    link = spec.building_path.split('__')[0] + '_id'
+    rows = model.objects.filter(**{link: target_id}).values(spec.group_field, *spec.sum_fields)
+    record_changes(model, [({**row, link: target_id}, {**row, link: None}) for row in rows.iterator()])
+
+
+def read_counters(scope=Scope.GLOBAL, scope_id=0):
+    """Return every counter of one scope as a ``{name: value}`` dict."""
+    return dict(Counter.objects.filter(scope=scope, scope_id=scope_id).values_list('name', 'value'))
+
+
+def read_counter(name, scope=Scope.GLOBAL, scope_id=0, default=0):
+    value = Counter.objects.filter(scope=scope, scope_id=scope_id, name=name).values_list('value', flat=True).first()
+    return default if value is None else value
+
+
+def compute_counters(scope=None, scope_ids=None):
+    """
+    Recompute counters with one grouped query per model and scope.
+
+    Returns a ``{(scope, scope_id, name): value}`` mapping.
+    """
+    tally = Tally()
+    for model, spec in SPECS.items():
+        levels = [(Scope.GLOBAL, None)]
+        if spec.building_path:
+            levels += [
+                (Scope.BUILDING, f'{spec.building_path}_id'),
+                (Scope.SUPERVISOR, f'{spec.building_path}__supervisor_id'),
+            ]
+        aggregates = {'rows': Count('id')}
+        aggregates.update({field: Sum(field) for field in spec.sum_fields})
+
+        for level, id_field in levels:
+            if scope is not None and level != scope:
+                continue
+            queryset = model.objects.all()
+            group = [spec.group_field]
+            if id_field:
+                queryset = queryset.filter(**{f'{id_field}__isnull': False})
+                if scope_ids is not None:
+                    queryset = queryset.filter(**{f'{id_field}__in': scope_ids})
+                group.insert(0, id_field)
+            for row in queryset.values(*group).annotate(**aggregates).order_by():
+                scope_id = row[id_field] if id_field else 0
+                tally[(level, scope_id, spec.prefix)] += row['rows']
+                tally[(level, scope_id, f'{spec.prefix}.{row[spec.group_field]}')] += row['rows']
+                for field in spec.sum_fields:
+                    tally[(level, scope_id, f'{spec.prefix}.{field}')] += row[field] or 0
+    return tally
+
+
+def rebuild_counters(scope=None, scope_ids=None):
+    """
+    Replace stored counters with freshly computed values.
+
+    ``scope``/``scope_ids`` restrict the rebuild, e.g. to the supervisors
+    whose buildings were reassigned. Returns the number of counters
+    whose stored value was wrong.
+    """
+    fresh = compute_counters(scope, scope_ids)
+    stored = Counter.objects.all()
+    if scope is not None:
+        stored = stored.filter(scope=scope)
+        if scope_ids is not None:
+            stored = stored.filter(scope_id__in=scope_ids)
+
+    with transaction.atomic():
+        current = {(c.scope, c.scope_id, c.name): c.value for c in stored.select_for_update()}
+        drifted = sum(1 for key in current.keys() | fresh.keys() if current.get(key, 0) != fresh.get(key, 0))
+        stored.delete()
+        Counter.objects.bulk_create(
+            [Counter(scope=s, scope_id=i, name=n, value=v) for (s, i, n), v in fresh.items()],
+            batch_size=500,
+        )
+    return drifted
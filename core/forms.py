@@ -0,0 +1,33 @@
+from django import forms
+from housing.models import Building
+
+from .images import normalize
+
+
+class NormalizedImageField(forms.ImageField):
+    """An image upload, size-checked and re-encoded by ``core.images.normalize``."""
+
+    def to_python(self, data):
+        f = super().to_python(data)
+        if f is None:
+            return None
+        return normalize(f)
+
+
+class ReportFilterForm(forms.Form):
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        label='From'
+    )
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        label='To'
+    )
+    building = forms.ModelChoiceField(
+        queryset=Building.objects.order_by('name'),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label='Building'
+    )
@@ -0,0 +1,144 @@
+"""
+Uploaded image pipeline.
+
+``normalize`` runs when a form accepts an image: it refuses files and
+pixel counts above the limits before decoding them (a small compressed
+file can expand into gigabytes), applies the camera orientation, scales
+anything larger than ``MAX_DIMENSION`` down and re-encodes the result,
+which drops EXIF (GPS position, device) along with the original bytes.
+
+``save_derivatives`` then writes fixed-size versions next to the stored
+original (``cas/ab/cd/<digest>.avatar.jpg`` beside
+``cas/ab/cd/<digest>.png``) when the upload is saved; ``dedupe_media``
+writes them for older files. The ``thumbnail`` template tag only builds
+the URL of the one a page needs, without touching the files.
+"""
+import io
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+MAX_BYTES = 20 * 1024 * 1024
+# A 48 MP phone camera is 8000x6000; anything beyond is refused unread.
+MAX_PIXELS = 50_000_000
+MAX_DIMENSION = 2048
+JPEG_QUALITY = 85
+
+# name -> (width, height, crop to fill)
+DERIVATIVES = {
+    'avatar': (64, 64, True),
+    'list': (160, 160, True),
+    'detail': (800, 800, False),
+}
+
+
+def _open(upload):
+    if upload.size is not None and upload.size > MAX_BYTES:
+        raise ValidationError(
+            'Images may be at most %(limit)d MB.', code='file_too_large',
+            params={'limit': MAX_BYTES // (1024 * 1024)},
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)  # Reads the header only.
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        raise ValidationError('Upload a valid image.', code='invalid_image')
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ValidationError(
+            'Images may be at most %(limit)d megapixels.', code='too_many_pixels',
+            params={'limit': MAX_PIXELS // 1_000_000},
+        )
+    return image
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _encode(image, alpha):
+    out = io.BytesIO()
+    if alpha:
+        image.save(out, 'PNG', optimize=True)
+        return out.getvalue(), '.png'
+    image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue(), '.jpg'
+
+
+def normalize(upload):
+    """
+    Return ``upload`` re-encoded as a ``ContentFile`` (JPEG, or PNG when
+    it has transparency), upright, without metadata and at most
+    ``MAX_DIMENSION`` pixels on its longer side. Raises
+    ``ValidationError`` for oversized or unreadable images.
+    """
+    image = _open(upload)
+    try:
+        # Lets the JPEG decoder skip detail that the downscale would throw away.
+        image.draft('RGB', (MAX_DIMENSION, MAX_DIMENSION))
+        image = ImageOps.exif_transpose(image)
+        alpha = _has_alpha(image)
+        image = image.convert('RGBA' if alpha else 'RGB')
+        image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
+        data, extension = _encode(image, alpha)
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        raise ValidationError('Upload a valid image.', code='invalid_image')
+    stem = os.path.splitext(os.path.basename(upload.name or 'image'))[0]
+    return ContentFile(data, name=stem + extension)
+
+
+def derivative_name(name, size):
+    return f'{os.path.splitext(name)[0]}.{size}.jpg'
+
+
+def derived_from(name):
+    """The extensionless name of the original a derivative was made from, or ``None`` for originals."""
+    stem, extension = os.path.splitext(name)
+    base, _, size = stem.rpartition('.')
+    if extension != '.jpg' or not base or size not in DERIVATIVES:
+        return None
+    return base
+
+
+def _render(image, size):
+    width, height, crop = DERIVATIVES[size]
+    if crop:
+        image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail((width, height), Image.Resampling.LANCZOS)
+    if _has_alpha(image):
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA'))
+        image = background
+    out = io.BytesIO()
+    image.convert('RGB').save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def save_derivatives(name, sizes=None, storage=None):
+    """
+    Write the derivatives of the stored image ``name`` that do not exist
+    yet. Returns {size: derivative name} for those written; an
+    unreadable original raises ``OSError``.
+    """
+    storage = storage or default_storage
+    sizes = sizes or list(DERIVATIVES)
+    missing = {
+        size: derived for size in sizes
+        if not storage.exists(derived := derivative_name(name, size))
+    }
+    if missing:
+        with storage.open(name, 'rb') as handle:
+            image = Image.open(handle)
+            image.draft('RGB', (MAX_DIMENSION, MAX_DIMENSION))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+        # Stored under the name beside the original rather than under a name of its own content.
+        save = getattr(storage, 'save_derivative', storage.save)
+        for size, derived in missing.items():
+            missing[size] = save(derived, ContentFile(_render(image, size)))
+    return missing
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and monthly application rollups from HousingApplication.'
+
+    def handle(self, *args, **options):
+        rows = backfill_rollups()
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} rollup rows.'))
@@ -0,0 +1,90 @@
+import json
+import math
+import platform
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from core.benchmarks import compare, format_report, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the list views and dashboards against seeded campuses of increasing size. '
+        'Runs in a throwaway test database; your data is not touched.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='Numbers of students to seed.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per view.')
+        parser.add_argument('--output', default='benchmarks/latest.json')
+        parser.add_argument('--baseline', default='benchmarks/baseline.json')
+        parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative p95 growth before flagging.')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        baseline_path = Path(options['baseline'])
+        baseline = json.loads(baseline_path.read_text())['results'] if baseline_path.exists() else {}
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = {}
+            for size in options['sizes']:
+                self.stdout.write(f'Seeding {size} students...')
+                users = self.seed(size)
+                self.stdout.write(f'Benchmarking {size} students...')
+                results[str(size)] = run_benchmarks(users, repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        document = {
+            'meta': {
+                'created': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+                'repeat': options['repeat'],
+            },
+            'results': results,
+        }
+        self.write(Path(options['output']), document)
+        if options['save_baseline']:
+            self.write(baseline_path, document)
+
+        rows = compare(results, baseline, tolerance=options['tolerance'])
+        self.stdout.write(format_report(rows))
+        if options['fail_on_regression'] and any(row['regressions'] for row in rows):
+            raise CommandError('Benchmark regressions found.')
+
+    def seed(self, size):
+        call_command('flush', interactive=False, verbosity=0)
+        # 200 rooms of 2 beds per building leave room for 60% of students.
+        call_command(
+            'seed_campus',
+            students=size,
+            buildings=max(2, math.ceil(size / 500)),
+            rooms_per_building=200,
+            seed=1,
+            prefix='bench',
+            verbosity=0,
+            stdout=self.stdout,
+        )
+        admin = CustomUser.objects.create_superuser(username='bench-admin', password=None, governorate="Sana'a")
+        supervisor = CustomUser.objects.filter(role=CustomUser.Role.SUPERVISOR).order_by('pk').first()
+        student = CustomUser.objects.filter(
+            role=CustomUser.Role.STUDENT, current_application_status='accepted',
+        ).order_by('pk').first()
+        return {'ADMIN': admin, 'SUPERVISOR': supervisor, 'STUDENT': student}
+
+    def write(self, path, document):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(document, indent=2))
+        self.stdout.write(f'Wrote {path}')
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from core.storage import dedupe_media
+
+
+class Command(BaseCommand):
+    help = (
+        'Move uploaded files into the content-addressed layout so identical files are stored once, '
+        'point the records at them, write missing image thumbnails and report the disk space reclaimed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed without changing anything.')
+        parser.add_argument('--prune', action='store_true', help='Also delete stored content no record refers to.')
+
+    def handle(self, *args, **options):
+        report = dedupe_media(dry_run=options['dry_run'], prune=options['prune'])
+        reclaimed = report.bytes_before - report.bytes_after + report.pruned
+        self.stdout.write(
+            f'{report.references} file references, {report.files} distinct files, {report.missing} missing.'
+        )
+        self.stdout.write(
+            f'Referenced files: {filesizeformat(report.bytes_before)} before, {filesizeformat(report.bytes_after)} after.'
+        )
+        if report.thumbnails or report.unreadable:
+            self.stdout.write(f'Thumbnails written: {report.thumbnails}; unreadable images: {report.unreadable}.')
+        if report.pruned:
+            self.stdout.write(f'Pruned unreferenced content: {filesizeformat(report.pruned)}.')
+        verb = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {filesizeformat(reclaimed)}.'))
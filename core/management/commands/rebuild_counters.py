@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import rebuild_counters
+from core.models import Counter
+
+
+class Command(BaseCommand):
+    help = 'Recompute every stored counter from the source tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scope',
+            choices=Counter.Scope.values,
+            help='Only rebuild counters of this scope.',
+        )
+
+    def handle(self, *args, **options):
+        drifted = rebuild_counters(scope=options['scope'])
+        total = Counter.objects.count()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} counters ({drifted} had drifted).'))
@@ -0,0 +1,329 @@
+import random
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser, StudentProfile
+from applications.models import HousingApplication
+from applications.signals import refresh_current_application
+from complaints.models import Complaint
+from core.cache import bump_version
+from core.counters import rebuild_counters
+from core.rollups import backfill_rollups
+from core.scopes import SCOPE_NAMESPACE
+from core.stats import STATS_NAMESPACE
+from housing import availability
+from housing.models import Building, Room
+from payments.models import Invoice, Payment
+from services.models import Service, StudentService
+
+COMPLAINT_TYPES = ['Water', 'Electricity', 'Internet', 'Furniture', 'Cleaning', 'Noise']
+COMPLAINT_STATUSES = Complaint.Status.values
+GOVERNORATES = CustomUser.Governorate.values
+GENDERS = CustomUser.Gender.values
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a reproducible synthetic campus for load and scale testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--buildings', type=int, default=10)
+        parser.add_argument('--rooms-per-building', type=int, default=50)
+        parser.add_argument('--room-capacity', type=int, default=2)
+        parser.add_argument('--supervisors', type=int, default=None, help='Defaults to one per two buildings.')
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--accepted', type=int, default=None, help='Accepted applications (default: 60%% of students, capped by free beds).')
+        parser.add_argument('--pending', type=int, default=None, help='Pending applications (default: 30%% of students).')
+        parser.add_argument('--rejected', type=int, default=None, help='Rejected applications (default: the remaining students).')
+        parser.add_argument('--invoices-per-student', type=int, default=2)
+        parser.add_argument('--paid-ratio', type=float, default=0.5, help='Share of invoices that are paid.')
+        parser.add_argument('--complaints', type=int, default=None, help='Defaults to one per five students.')
+        parser.add_argument('--services', type=int, default=5)
+        parser.add_argument('--subscriptions-per-student', type=int, default=1)
+        parser.add_argument('--history-days', type=int, default=365, help='Spread application and complaint dates over this many days.')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='seed', help='Prefix for generated usernames and names.')
+        parser.add_argument('--password', default='password123')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.now = timezone.now()
+        self.history = timedelta(days=options['history_days'])
+        # One hash shared by every generated account: hashing per user
+        # would dominate the run time.
+        self.password_hash = make_password(options['password'])
+        # Phones are unique; derive their prefix from --prefix so separate
+        # seeded campuses do not collide.
+        self.phone_base = f'9{zlib.crc32(self.prefix.encode()) % 900 + 100}'
+
+        if CustomUser.objects.filter(username__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f'Data with prefix "{self.prefix}" already exists; choose another --prefix.')
+
+        students = options['students']
+        rooms = options['buildings'] * options['rooms_per_building']
+        # Every 50th room is put in maintenance and takes no students.
+        beds = (rooms - rooms // 50) * options['room_capacity']
+        accepted = options['accepted'] if options['accepted'] is not None else min(beds, int(students * 0.6))
+        pending = options['pending'] if options['pending'] is not None else int(students * 0.3)
+        rejected = options['rejected'] if options['rejected'] is not None else max(0, students - accepted - pending)
+        if accepted > beds:
+            raise CommandError(f'Cannot accept {accepted} applications with only {beds} beds.')
+        if accepted + pending + rejected > students:
+            raise CommandError('There are more applications than students.')
+
+        started = timezone.now()
+        with transaction.atomic():
+            supervisor_ids = self.create_supervisors(options['supervisors'] or max(1, options['buildings'] // 2))
+            building_ids = self.create_buildings(options['buildings'], supervisor_ids)
+            beds = self.create_rooms(building_ids, options['rooms_per_building'], options['room_capacity'], accepted)
+            student_ids = self.create_students(students)
+            placements = self.create_applications(student_ids, beds, accepted, pending, rejected)
+            self.create_invoices(student_ids, options['invoices_per_student'], options['paid_ratio'])
+            self.create_complaints(placements, options['complaints'] if options['complaints'] is not None else students // 5)
+            self.create_services(student_ids, options['services'], options['subscriptions_per_student'])
+
+            # Inserts bypass signals: rebuild everything derived from them.
+            refresh_current_application(
+                CustomUser.objects.filter(username__startswith=f'{self.prefix}-student-').values('pk')
+            )
+            rebuild_counters()
+            backfill_rollups()
+        bump_version(STATS_NAMESPACE)
+        bump_version(SCOPE_NAMESPACE)
+        availability.invalidate()
+
+        elapsed = (timezone.now() - started).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(building_ids)} buildings, {rooms} rooms, {students} students '
+            f'({accepted} accepted, {pending} pending, {rejected} rejected) in {elapsed:.1f}s.'
+        ))
+
+    def insert(self, model, rows):
+        """
+        Insert ``rows`` (dicts of field name -> value) with executemany.
+
+        Model instances and per-row SQL compilation cost more than the
+        database itself at this volume, so rows go straight to the cursor.
+        Fields missing from a row take their default; auto_now(_add)
+        fields take the start time of the run.
+        """
+        # The connection itself, not the thread-local proxy: it is used
+        # for every converted value.
+        connection = connections[DEFAULT_DB_ALIAS]
+        adapters = {
+            'DateField': connection.ops.adapt_datefield_value,
+            'DateTimeField': connection.ops.adapt_datetimefield_value,
+            'DecimalField': connection.ops.adapt_decimalfield_value,
+        }
+        fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        converters = [adapters.get(field.get_internal_type()) for field in fields]
+        defaults = []
+        for field, convert in zip(fields, converters):
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                value = self.now.date() if field.get_internal_type() == 'DateField' else self.now
+            else:
+                value = field.get_default()
+            defaults.append(convert(value) if convert else value)
+
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        columns = list(zip([field.name for field in fields], converters, defaults))
+        with connection.cursor() as cursor:
+            batch = []
+            for row in rows:
+                batch.append([
+                    (convert(row[name]) if convert else row[name]) if name in row else default
+                    for name, convert, default in columns
+                ])
+                if len(batch) >= self.batch_size:
+                    cursor.executemany(sql, batch)
+                    batch = []
+            if batch:
+                cursor.executemany(sql, batch)
+
+    def past(self):
+        return self.now - self.history * self.rng.random()
+
+    def user(self, username, index, **fields):
+        return {
+            'username': username,
+            'email': f'{username}@example.com',
+            'password': self.password_hash,
+            'first_name': f'First{index}',
+            'last_name': f'Last{index}',
+            'phone': f'{self.phone_base}{index:07d}',
+            'governorate': self.rng.choice(GOVERNORATES),
+            'gender': self.rng.choice(GENDERS),
+            'age': self.rng.randint(18, 26),
+            'date_joined': self.now,
+            **fields,
+        }
+
+    def user_ids(self, kind):
+        """Return generated user pks of one kind, in creation order."""
+        rows = CustomUser.objects.filter(username__startswith=f'{self.prefix}-{kind}-').values_list('username', 'pk')
+        by_name = dict(rows)
+        return [by_name[f'{self.prefix}-{kind}-{n}'] for n in range(len(by_name))]
+
+    def create_supervisors(self, count):
+        self.insert(CustomUser, (
+            self.user(f'{self.prefix}-supervisor-{n}', n, role=CustomUser.Role.SUPERVISOR, is_approved=True)
+            for n in range(count)
+        ))
+        return self.user_ids('supervisor')
+
+    def create_buildings(self, count, supervisor_ids):
+        names = [f'{self.prefix} Building {n + 1}' for n in range(count)]
+        self.insert(Building, (
+            {'name': name, 'address': f'Campus block {n + 1}', 'supervisor': supervisor_ids[n % len(supervisor_ids)]}
+            for n, name in enumerate(names)
+        ))
+        by_name = dict(Building.objects.filter(name__in=names).values_list('name', 'pk'))
+        return [by_name[name] for name in names]
+
+    def create_rooms(self, building_ids, per_building, capacity, accepted):
+        """Create rooms filled up to ``accepted`` students; return one (building, room) pair per taken bed."""
+        rooms = []
+        for building_id in building_ids:
+            for n in range(per_building):
+                floor, number = divmod(n, 50)
+                rooms.append({
+                    'building': building_id,
+                    'number': f'{floor + 1}{number + 1:02d}',
+                    'capacity': capacity,
+                    'current_occupants': 0,
+                    'status': Room.Status.AVAILABLE,
+                })
+        for room in rooms[49::50]:
+            room['status'] = Room.Status.MAINTENANCE
+
+        remaining = accepted
+        for room in rooms:
+            if not remaining:
+                break
+            if room['status'] == Room.Status.MAINTENANCE:
+                continue
+            room['current_occupants'] = min(capacity, remaining)
+            remaining -= room['current_occupants']
+            if room['current_occupants'] >= capacity:
+                room['status'] = Room.Status.OCCUPIED
+        self.insert(Room, rooms)
+
+        pks = {
+            (building_id, number): pk
+            for building_id, number, pk in Room.objects.filter(building_id__in=building_ids).values_list('building_id', 'number', 'pk')
+        }
+        return [
+            (room['building'], pks[(room['building'], room['number'])])
+            for room in rooms
+            for _ in range(room['current_occupants'])
+        ]
+
+    def create_students(self, count):
+        offset = 10 ** 6
+        self.students = [
+            self.user(f'{self.prefix}-student-{n}', offset + n, role=CustomUser.Role.STUDENT, student_id=f'2{n:07d}')
+            for n in range(count)
+        ]
+        self.insert(CustomUser, self.students)
+        return self.user_ids('student')
+
+    def create_applications(self, student_ids, beds, accepted, pending, rejected):
+        """Create one application per student; return (student, room) pairs of accepted ones."""
+        Status = HousingApplication.Status
+        statuses = [Status.ACCEPTED] * accepted + [Status.PENDING] * pending + [Status.REJECTED] * rejected
+
+        applications = []
+        placements = []
+        for index, (student_id, status) in enumerate(zip(student_ids, statuses)):
+            student = self.students[index]
+            application = {
+                'student': student_id,
+                'name': f"{student['first_name']} {student['last_name']}",
+                'phone': student['phone'],
+                'age': student['age'],
+                'governorate': student['governorate'],
+                'status': status,
+                'created_at': self.past(),
+            }
+            if status == Status.ACCEPTED:
+                building_id, room_id = beds[index]
+                application['assigned_building'] = building_id
+                application['assigned_room'] = room_id
+                placements.append((student_id, room_id))
+            applications.append(application)
+        self.insert(HousingApplication, applications)
+
+        self.insert(StudentProfile, ({'user': student_id, 'room': room_id} for student_id, room_id in placements))
+        CustomUser.objects.filter(
+            pk__in=StudentProfile.objects.filter(user__username__startswith=f'{self.prefix}-student-').values('user')
+        ).update(is_approved=True)
+        return placements
+
+    def create_invoices(self, student_ids, per_student, paid_ratio):
+        self.insert(Invoice, (
+            {
+                'student': student_id,
+                'amount': Decimal(self.rng.choice([150, 200, 250, 300])),
+                'due_date': (self.now + timedelta(days=self.rng.randint(-120, 60))).date(),
+                'status': Invoice.Status.PAID if self.rng.random() < paid_ratio else Invoice.Status.UNPAID,
+            }
+            for student_id in student_ids
+            for _ in range(per_student)
+        ))
+        paid = Invoice.objects.filter(
+            student__username__startswith=f'{self.prefix}-student-', status=Invoice.Status.PAID,
+        ).values_list('pk', 'amount').iterator(chunk_size=self.batch_size)
+        self.insert(Payment, (
+            {
+                'invoice': invoice_id,
+                'amount': amount,
+                'method': self.rng.choice(['cash', 'card', 'transfer']),
+                'transaction_id': f'{self.prefix}-tx-{invoice_id}',
+            }
+            for invoice_id, amount in paid
+        ))
+
+    def create_complaints(self, placements, count):
+        if not placements:
+            return
+        complaints = []
+        for _ in range(count):
+            student_id, room_id = self.rng.choice(placements)
+            created_at = self.past()
+            complaints.append({
+                'student': student_id,
+                'room': room_id,
+                'type': self.rng.choice(COMPLAINT_TYPES),
+                'description': 'Generated complaint for load testing.',
+                'status': self.rng.choice(COMPLAINT_STATUSES),
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        self.insert(Complaint, complaints)
+
+    def create_services(self, student_ids, count, per_student):
+        names = [f'{self.prefix} Service {n + 1}' for n in range(count)]
+        self.insert(Service, (
+            {'name': name, 'description': 'Generated service.', 'price': Decimal(self.rng.choice([10, 20, 35, 50]))}
+            for name in names
+        ))
+        service_ids = list(Service.objects.filter(name__in=names).values_list('pk', flat=True))
+        per_student = min(per_student, len(service_ids))
+        self.insert(StudentService, (
+            {'student': student_id, 'service': service_id}
+            for student_id in student_ids
+            for service_id in self.rng.sample(service_ids, per_student)
+        ))
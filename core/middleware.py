@@ -0,0 +1,144 @@
+"""
+Per-request instrumentation.
+
+``RequestMetricsMiddleware`` records, for every request, the number of
+SQL queries and the time spent in them, the time spent rendering
+templates and the wall time of the whole request. The numbers are sent
+back in a ``Server-Timing`` header and logged as one JSON line on the
+``core.metrics`` logger. Template time comes from the template backend
+in ``core.templating``.
+
+A streaming response (the report exports) runs most of its queries
+while the server sends the body, after the view has returned. Its
+queries are counted until the body is exhausted and it is logged and
+checked against its budget then; the headers have gone out by that
+time, so it carries no ``Server-Timing`` header. (Async streams cannot
+run ORM queries directly and are recorded when the view returns.)
+
+Query budgets are configured per URL name in ``QUERY_BUDGETS`` (with
+``QUERY_BUDGET_DEFAULT`` as fallback). A request over budget logs a
+warning, or raises ``QueryBudgetExceeded`` when ``QUERY_BUDGET_RAISE``
+is set, which is how tests catch new N+1 patterns.
+"""
+import contextvars
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('core.metrics')
+
+_active = contextvars.ContextVar('request_metrics', default=None)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.total_time = 0.0
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+    def as_dict(self):
+        return {
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'total_ms': round(self.total_time * 1000, 1),
+        }
+
+
+def current_metrics():
+    """Return the metrics of the request being handled, if any."""
+    return _active.get()
+
+
+@contextmanager
+def _recording_queries(metrics):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics.record_query))
+        yield
+
+
+def query_budget(view_name):
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    return budgets.get(view_name, getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = _active.set(metrics)
+        start = time.perf_counter()
+        try:
+            with _recording_queries(metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            _active.reset(token)
+
+        if not response.streaming:
+            response['Server-Timing'] = metrics.server_timing()
+        elif not response.is_async:
+            response.streaming_content = self.measure_stream(response.streaming_content, request, response, metrics, start)
+            return response
+        self.record(request, response, metrics)
+        return response
+
+    def measure_stream(self, content, request, response, metrics, start):
+        """Pass the body through, counting its queries; record the request once it has been sent."""
+        try:
+            with _recording_queries(metrics):
+                yield from content
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            self.record(request, response, metrics)
+
+    def record(self, request, response, metrics):
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        logger.info(json.dumps({
+            'view': view_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **metrics.as_dict(),
+        }))
+        self.check_budget(view_name, metrics)
+
+    def check_budget(self, view_name, metrics):
+        budget = query_budget(view_name)
+        if budget is None or metrics.queries <= budget:
+            return
+        message = f'{view_name} ran {metrics.queries} queries (budget {budget}).'
+        if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('global', 'Global'), ('building', 'Building'), ('supervisor', 'Supervisor')], default='global', max_length=20)),
+                ('scope_id', models.PositiveBigIntegerField(default=0)),
+                ('name', models.CharField(max_length=100)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'scope_id', 'name')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('status', models.CharField(max_length=20)),
+                ('governorate', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('period', 'period_start', 'status', 'governorate')},
+            },
+        ),
+    ]
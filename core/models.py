@@ -0,0 +1,41 @@
+from django.db import models
+
+
+class Counter(models.Model):
+    """A named running total, maintained by signals in core.counters."""
+
+    class Scope(models.TextChoices):
+        GLOBAL = "global", "Global"
+        BUILDING = "building", "Building"
+        SUPERVISOR = "supervisor", "Supervisor"
+
+    scope = models.CharField(max_length=20, choices=Scope.choices, default=Scope.GLOBAL)
+    scope_id = models.PositiveBigIntegerField(default=0)
+    name = models.CharField(max_length=100)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'scope_id', 'name')
+
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id}:{self.name} = {self.value}"
+
+
+class ApplicationRollup(models.Model):
+    """Number of housing applications per period, status and governorate."""
+
+    class Period(models.TextChoices):
+        DAY = "day", "Day"
+        MONTH = "month", "Month"
+
+    period = models.CharField(max_length=10, choices=Period.choices)
+    period_start = models.DateField()
+    status = models.CharField(max_length=20)
+    governorate = models.CharField(max_length=100)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('period', 'period_start', 'status', 'governorate')
+
+    def __str__(self):
+        return f"{self.period} {self.period_start} {self.status}/{self.governorate}: {self.count}"
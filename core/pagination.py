@@ -0,0 +1,128 @@
+"""
+Keyset (seek) pagination.
+
+Instead of ``OFFSET``, each page is fetched with a ``WHERE`` on the sort
+key of the row at the edge of the previous page, so page 1000 costs the
+same as page 1 when an index covers the ordering. Pages are addressed by
+opaque cursors that carry the direction and those key values.
+
+``ordering`` names the sort fields (``-`` for descending) and must end
+in a unique combination; annotated fields may be used. Cursor values
+come from the client, so each is converted with its field's
+``to_python`` before it reaches a query.
+"""
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+PER_PAGE = 50
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder rounds to milliseconds; a cursor must keep the exact key.
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, values], cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, width):
+    """Return ``(direction, values)``; a missing or malformed cursor means the first page."""
+    if not cursor:
+        return 'next', None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        return 'next', None
+    if direction not in ('next', 'previous') or not isinstance(values, list) or len(values) != width:
+        return 'next', None
+    return direction, values
+
+
+def _clean(queryset, fields, values):
+    """``values`` as the Python types of their fields; raises ``ValueError`` for a value that is not one."""
+    cleaned = []
+    for (name, _), value in zip(fields, values):
+        annotation = queryset.query.annotations.get(name)
+        field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+        value = field.to_python(value)
+        if value is None:
+            raise ValueError(f'Missing cursor value for {name}.')
+        cleaned.append(value)
+    return cleaned
+
+
+def _seek(fields, values, backwards):
+    """Rows strictly after ``values`` in the ordering (before, if ``backwards``)."""
+    condition = Q()
+    for index, (name, descending) in enumerate(fields):
+        lookup = 'lt' if descending != backwards else 'gt'
+        clause = Q(**{f'{name}__{lookup}': values[index]})
+        for position, (prior, _) in enumerate(fields[:index]):
+            clause &= Q(**{prior: values[position]})
+        condition |= clause
+    # The redundant range on the leading field lets the database seek into
+    # the index instead of scanning it from the start.
+    name, descending = fields[0]
+    lookup = 'lte' if descending != backwards else 'gte'
+    return Q(**{f'{name}__{lookup}': values[0]}) & condition
+
+
+def paginate(queryset, ordering, cursor=None, per_page=PER_PAGE):
+    fields = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+    direction, values = decode_cursor(cursor, len(fields))
+    if values is not None:
+        try:
+            values = _clean(queryset, fields, values)
+        except (ValueError, TypeError, ValidationError):
+            direction, values = 'next', None  # A tampered cursor means the first page, like a malformed one.
+    backwards = direction == 'previous'
+
+    if values is not None:
+        queryset = queryset.filter(_seek(fields, values, backwards))
+    order = [name if descending == backwards else f'-{name}' for name, descending in fields]
+    rows = list(queryset.order_by(*order)[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    has_next = values is not None if backwards else more
+    has_previous = more if backwards else values is not None
+    key = lambda row: [getattr(row, name) for name, _ in fields]
+    return KeysetPage(
+        rows,
+        encode_cursor('next', key(rows[-1])) if rows and has_next else None,
+        encode_cursor('previous', key(rows[0])) if rows and has_previous else None,
+    )
@@ -0,0 +1,72 @@
+"""
+On-demand request profiling.
+
+``ProfilingMiddleware`` wraps selected requests in cProfile: requests by
+superusers that carry ``?profile`` in the query string, and a random
+``PROFILING_SAMPLE_RATE`` share of all traffic. Each profile is saved
+under ``PROFILING_DIR/<url name>/`` as a ``.prof`` file (open it with
+``python -m pstats`` or snakeviz) next to a ``.txt`` summary of the top
+``PROFILING_TOP`` functions by cumulative time.
+
+With ``PROFILING_ENABLED`` off the middleware removes itself from the
+chain at startup, so it costs nothing to leave installed.
+"""
+import cProfile
+import io
+import logging
+import pstats
+import random
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+logger = logging.getLogger('core.metrics')
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = Path(settings.PROFILING_DIR)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.top = getattr(settings, 'PROFILING_TOP', 40)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active (e.g. a concurrent request on 3.12+).
+            return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        self.save(request, response, profiler)
+        return response
+
+    def should_profile(self, request):
+        user = getattr(request, 'user', None)
+        if 'profile' in request.GET and user is not None and user.is_superuser:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def save(self, request, response, profiler):
+        match = request.resolver_match
+        view_name = (match.view_name if match else None) or 'unresolved'
+        directory = self.directory / view_name.replace(':', '.')
+        directory.mkdir(parents=True, exist_ok=True)
+        stem = f"{timezone.now():%Y%m%dT%H%M%S.%f}-{request.method.lower()}"
+
+        profiler.dump_stats(directory / f'{stem}.prof')
+        summary = io.StringIO()
+        summary.write(f'{request.method} {request.get_full_path()} -> {response.status_code}\n\n')
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(self.top)
+        (directory / f'{stem}.txt').write_text(summary.getvalue())
+        logger.info('Saved profile of %s to %s', view_name, directory / f'{stem}.prof')
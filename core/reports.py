@@ -0,0 +1,189 @@
+"""
+Admin reports.
+
+Each report is a values queryset plus column labels. The reports page
+shows every report's row count for the selected filters; exports stream
+the same queryset through ``.iterator()`` into ``core.exports``.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from applications.models import HousingApplication
+from complaints.models import Complaint
+from housing.models import Building
+from payments.models import Invoice
+from services.models import StudentService
+
+from .models import ApplicationRollup
+
+CHUNK_SIZE = 2000
+
+
+class Report:
+    slug = None
+    title = None
+    description = ''
+    # (field, label) pairs; fields are passed to values_list().
+    columns = ()
+    # Lookups the date range and building filters apply to, if any.
+    date_field = None
+    building_field = None
+
+    def __init__(self, date_from=None, date_to=None, building=None):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.building = building
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    @property
+    def labels(self):
+        return [label for _, label in self.columns]
+
+    def queryset(self):
+        queryset = self.get_queryset()
+        if self.date_field and self.date_from:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': self.date_from})
+        if self.date_field and self.date_to:
+            queryset = queryset.filter(**{f'{self.date_field}__lte': self.date_to})
+        if self.building_field and self.building:
+            queryset = queryset.filter(**{self.building_field: self.building.pk})
+        return queryset
+
+    def count(self):
+        return self.queryset().count()
+
+    def rows(self):
+        fields = [field for field, _ in self.columns]
+        return self.queryset().values_list(*fields).iterator(chunk_size=CHUNK_SIZE)
+
+
+class OccupancyReport(Report):
+    slug = 'occupancy'
+    title = 'Occupancy by Building'
+    description = 'Rooms, beds and free beds in every building.'
+    columns = (
+        ('name', 'Building'),
+        ('supervisor_name', 'Supervisor'),
+        ('total_rooms', 'Rooms'),
+        ('total_capacity', 'Capacity'),
+        ('occupied_beds', 'Occupied Beds'),
+        ('free_beds', 'Free Beds'),
+        ('maintenance_rooms', 'Rooms in Maintenance'),
+    )
+    building_field = 'pk'
+
+    def get_queryset(self):
+        return Building.objects.with_occupancy().order_by('name')
+
+
+class ApplicationFunnelReport(Report):
+    slug = 'application-funnel'
+    title = 'Application Funnel'
+    description = 'Applications per month and governorate by status. Not filtered by building.'
+    columns = (
+        ('period_start', 'Month'),
+        ('governorate', 'Governorate'),
+        ('total', 'Applications'),
+        ('pending', 'Pending'),
+        ('accepted', 'Accepted'),
+        ('rejected', 'Rejected'),
+    )
+    date_field = 'period_start'
+
+    def get_queryset(self):
+        Status = HousingApplication.Status
+        return (
+            ApplicationRollup.objects
+            .filter(period=ApplicationRollup.Period.MONTH)
+            .values('period_start', 'governorate')
+            .annotate(
+                total=Sum('count'),
+                pending=Sum('count', filter=Q(status=Status.PENDING), default=0),
+                accepted=Sum('count', filter=Q(status=Status.ACCEPTED), default=0),
+                rejected=Sum('count', filter=Q(status=Status.REJECTED), default=0),
+            )
+            .order_by('period_start', 'governorate')
+        )
+
+
+class UnpaidInvoiceReport(Report):
+    slug = 'unpaid-invoices'
+    title = 'Unpaid Invoices'
+    description = 'Open invoices with amounts paid so far and the outstanding balance.'
+    columns = (
+        ('id', 'Invoice'),
+        ('student__username', 'Student'),
+        ('student__first_name', 'First Name'),
+        ('student__last_name', 'Last Name'),
+        ('due_date', 'Due Date'),
+        ('amount', 'Amount'),
+        ('paid', 'Paid'),
+        ('outstanding', 'Outstanding'),
+    )
+    date_field = 'due_date'
+    building_field = 'student__student_profile__room__building'
+
+    def get_queryset(self):
+        money = DecimalField(max_digits=10, decimal_places=2)
+        paid = Coalesce(Sum('payments__amount'), Value(Decimal('0')), output_field=money)
+        return (
+            Invoice.objects
+            .filter(status=Invoice.Status.UNPAID)
+            .annotate(paid=paid, outstanding=F('amount') - paid)
+            .order_by('due_date', 'pk')
+        )
+
+
+class ComplaintBacklogReport(Report):
+    slug = 'complaint-backlog'
+    title = 'Complaint Backlog'
+    description = 'Complaints that are not resolved yet, oldest first.'
+    columns = (
+        ('id', 'Complaint'),
+        ('created_at', 'Submitted'),
+        ('status', 'Status'),
+        ('type', 'Type'),
+        ('student__username', 'Student'),
+        ('room__building__name', 'Building'),
+        ('room__number', 'Room'),
+    )
+    date_field = 'created_at__date'
+    building_field = 'room__building'
+
+    def get_queryset(self):
+        return Complaint.objects.exclude(status=Complaint.Status.RESOLVED).order_by('created_at', 'pk')
+
+
+class ServiceSubscriptionReport(Report):
+    slug = 'service-subscriptions'
+    title = 'Service Subscriptions'
+    description = 'Student service subscriptions with price and period.'
+    columns = (
+        ('student__username', 'Student'),
+        ('service__name', 'Service'),
+        ('service__price', 'Price'),
+        ('active', 'Active'),
+        ('start_date', 'Start Date'),
+        ('end_date', 'End Date'),
+    )
+    date_field = 'start_date'
+    building_field = 'student__student_profile__room__building'
+
+    def get_queryset(self):
+        return StudentService.objects.order_by('start_date', 'pk')
+
+
+REPORTS = {
+    report.slug: report
+    for report in (
+        OccupancyReport,
+        ApplicationFunnelReport,
+        UnpaidInvoiceReport,
+        ComplaintBacklogReport,
+        ServiceSubscriptionReport,
+    )
+}
@@ -0,0 +1,158 @@
+"""
+Application time-series rollups.
+
+``ApplicationRollup`` keeps one row per (day or month, status,
+governorate) with the number of applications created in that period.
+Signal handlers move an application between buckets when it is created,
+changes status or is deleted; ``backfill_rollups`` rebuilds the table
+from ``HousingApplication`` with grouped queries.
+
+Readers get gap-filled series whose cost depends on the length of the
+window, not on the size of the application history.
+"""
+from collections import Counter as Tally
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+from django.utils import timezone
+
+from applications.models import HousingApplication
+
+from .bulk import increment_rows
+from .models import ApplicationRollup
+from .tracking import StateTracker
+
+Period = ApplicationRollup.Period
+
+TRACKED_FIELDS = ('status', 'governorate', 'created_at')
+
+MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+tracker = StateTracker('_rollup_state', lambda model: TRACKED_FIELDS)
+
+
+def _buckets(state, sign, tally):
+    day = timezone.localdate(state['created_at'])
+    for period, start in ((Period.DAY, day), (Period.MONTH, day.replace(day=1))):
+        tally[(period, start, state['status'], state['governorate'])] += sign
+
+
+def apply_deltas(tally):
+    deltas = {key: amount for key, amount in tally.items() if amount}
+    if not deltas:
+        return
+    # Make sure every bucket exists, then add the deltas in SQL.
+    ApplicationRollup.objects.bulk_create(
+        [
+            ApplicationRollup(period=period, period_start=start, status=status, governorate=governorate)
+            for period, start, status, governorate in deltas
+        ],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    increment_rows(ApplicationRollup, 'count', ('period', 'period_start', 'status', 'governorate'), deltas)
+
+
+def record_save(instance, created):
+    old, new = tracker.saved(instance, created)
+    if old == new:
+        return
+
+    tally = Tally()
+    if old is not None:
+        _buckets(old, -1, tally)
+    _buckets(new, 1, tally)
+    with transaction.atomic():
+        apply_deltas(tally)
+
+
+def record_delete(instance):
+    state = tracker.deleted(instance)
+    if state is None:
+        return
+    tally = Tally()
+    _buckets(state, -1, tally)
+    with transaction.atomic():
+        apply_deltas(tally)
+
+
+def record_changes(changes):
+    """
+    Move applications changed by ``bulk_update`` or queryset ``update()``
+    between buckets. ``changes`` is an iterable of ``(old, new)`` states
+    with the tracked fields (``None`` for a missing row).
+    """
+    tally = Tally()
+    for old, new in changes:
+        if old == new:
+            continue
+        if old is not None:
+            _buckets(old, -1, tally)
+        if new is not None:
+            _buckets(new, 1, tally)
+    with transaction.atomic():
+        apply_deltas(tally)
+
+
+def backfill_rollups():
+    """Rebuild every rollup row from the application table. Returns the row count."""
+    rows = []
+    for period, trunc in ((Period.DAY, TruncDay), (Period.MONTH, TruncMonth)):
+        grouped = (
+            HousingApplication.objects
+            .annotate(bucket=trunc('created_at', output_field=DateField()))
+            .values('bucket', 'status', 'governorate')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+        for entry in grouped:
+            rows.append(ApplicationRollup(
+                period=period,
+                period_start=entry['bucket'],
+                status=entry['status'],
+                governorate=entry['governorate'],
+                count=entry['count'],
+            ))
+
+    with transaction.atomic():
+        ApplicationRollup.objects.all().delete()
+        ApplicationRollup.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _month_starts(months, today):
+    start = today.replace(day=1)
+    starts = [start]
+    for _ in range(months - 1):
+        start = (start - timedelta(days=1)).replace(day=1)
+        starts.append(start)
+    return starts[::-1]
+
+
+def _series(period, starts, status=None, governorate=None):
+    rows = ApplicationRollup.objects.filter(period=period, period_start__gte=starts[0], period_start__lte=starts[-1])
+    if status:
+        rows = rows.filter(status=status)
+    if governorate:
+        rows = rows.filter(governorate=governorate)
+    totals = dict(rows.values('period_start').annotate(total=Sum('count')).values_list('period_start', 'total'))
+    return [totals.get(start, 0) for start in starts]
+
+
+def monthly_series(months=6, status=None, governorate=None, today=None):
+    """
+    Return ``(labels, counts)`` for the last ``months`` months, current
+    month included. Months without applications are reported as 0.
+    """
+    starts = _month_starts(months, today or timezone.localdate())
+    labels = [MONTH_NAMES[start.month - 1] for start in starts]
+    return labels, _series(Period.MONTH, starts, status, governorate)
+
+
+def daily_series(days=30, status=None, governorate=None, today=None):
+    """Return ``(dates, counts)`` for the last ``days`` days, today included."""
+    today = today or timezone.localdate()
+    starts = [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    return starts, _series(Period.DAY, starts, status, governorate)
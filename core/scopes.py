@@ -0,0 +1,67 @@
+"""
+Supervisor workspace scope.
+
+A supervisor's buildings and rooms change rarely, while their dashboard
+is refreshed all day. ``SupervisorScope`` resolves the buildings (with
+their room counts) once and caches them per supervisor in the
+``supervisor-scope`` namespace, which ``core.signals`` bumps when a
+building is reassigned or a room is added, moved or removed. Room-level
+querysets join through the building instead of carrying room IDs, which
+would turn into IN-lists with thousands of parameters.
+"""
+from django.db.models import Count
+
+from applications.models import HousingApplication
+from complaints.models import Complaint
+from housing.models import Building
+
+from .cache import get_or_set
+from .counters import read_counters
+from .models import Counter
+
+SCOPE_NAMESPACE = 'supervisor-scope'
+SCOPE_TIMEOUT = 60 * 60
+
+
+class SupervisorScope:
+    def __init__(self, supervisor_id, buildings):
+        self.supervisor_id = supervisor_id
+        self.buildings = buildings
+        self.building_ids = [building['id'] for building in buildings]
+
+    @classmethod
+    def resolve(cls, supervisor_id):
+        """Load the supervisor's buildings with their room counts."""
+        buildings = list(
+            Building.objects
+            .filter(supervisor_id=supervisor_id)
+            .annotate(room_count=Count('rooms'))
+            .order_by('name')
+            .values('id', 'name', 'room_count')
+        )
+        return {'buildings': buildings}
+
+    @classmethod
+    def for_user(cls, user):
+        data = get_or_set(SCOPE_NAMESPACE, [user.pk], lambda: cls.resolve(user.pk), SCOPE_TIMEOUT)
+        return cls(user.pk, data['buildings'])
+
+    def summary(self):
+        """Headline numbers, read from the supervisor's counters in one query."""
+        counters = read_counters(Counter.Scope.SUPERVISOR, self.supervisor_id)
+        complaints = counters.get('complaints', 0)
+        resolved = counters.get(f'complaints.{Complaint.Status.RESOLVED}', 0)
+        return {
+            'my_buildings_count': len(self.buildings),
+            'pending_moveins_count': counters.get(f'applications.{HousingApplication.Status.ACCEPTED}', 0),
+            'active_complaints_count': complaints - resolved,
+        }
+
+    def accepted_applications(self):
+        return HousingApplication.objects.filter(
+            assigned_building_id__in=self.building_ids,
+            status=HousingApplication.Status.ACCEPTED,
+        ).select_related('assigned_room')
+
+    def complaints(self):
+        return Complaint.objects.filter(room__building__supervisor_id=self.supervisor_id).select_related('room', 'student')
@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from accounts.models import CustomUser
+from applications.models import HousingApplication
+from complaints.models import Complaint
+from housing import availability
+from housing.models import Building, Room
+
+from . import counters, rollups
+from .cache import bump_version
+from .models import Counter
+from .scopes import SCOPE_NAMESPACE
+from .stats import STATS_NAMESPACE
+
+COUNTED_MODELS = list(counters.SPECS)
+
+
+def remember_counter_state(sender, instance, **kwargs):
+    counters.tracker.remember(instance)
+
+
+def prepare_counter_update(sender, instance, raw=False, **kwargs):
+    if not raw:
+        counters.tracker.prepare(instance)
+
+
+def update_counters(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.record_save(instance, created)
+
+
+def decrement_counters(sender, instance, **kwargs):
+    counters.record_delete(instance)
+
+
+for model in COUNTED_MODELS:
+    post_init.connect(remember_counter_state, sender=model, dispatch_uid=f'counters_init_{model.__name__}')
+    pre_save.connect(prepare_counter_update, sender=model, dispatch_uid=f'counters_pre_save_{model.__name__}')
+    post_save.connect(update_counters, sender=model, dispatch_uid=f'counters_save_{model.__name__}')
+    post_delete.connect(decrement_counters, sender=model, dispatch_uid=f'counters_delete_{model.__name__}')
+
+
+# Connected after the counter receivers and run on commit: a dashboard
+# rebuilt before then would cache a snapshot of the old counters under
+# the new version.
+@receiver([post_save, post_delete], sender=CustomUser)
+@receiver([post_save, post_delete], sender=Complaint)
+@receiver([post_save, post_delete], sender=HousingApplication)
+@receiver([post_save, post_delete], sender=Room)
+def invalidate_admin_stats(sender, **kwargs):
+    """Any write to a counted table makes the dashboard snapshot stale."""
+    transaction.on_commit(lambda: bump_version(STATS_NAMESPACE))
+
+
+@receiver(pre_delete, sender=Room)
+def unlink_complaints(sender, instance, **kwargs):
+    counters.record_unlink(Complaint, instance.pk)
+
+
+@receiver(pre_delete, sender=Building)
+def unlink_applications(sender, instance, **kwargs):
+    counters.record_unlink(HousingApplication, instance.pk)
+
+
+@receiver(post_init, sender=HousingApplication)
+def remember_rollup_state(sender, instance, **kwargs):
+    rollups.tracker.remember(instance)
+
+
+@receiver(pre_save, sender=HousingApplication)
+def prepare_rollup_update(sender, instance, raw=False, **kwargs):
+    if not raw:
+        rollups.tracker.prepare(instance)
+
+
+@receiver(post_save, sender=HousingApplication)
+def update_rollups(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        rollups.record_save(instance, created)
+
+
+@receiver(post_delete, sender=HousingApplication)
+def remove_from_rollups(sender, instance, **kwargs):
+    rollups.record_delete(instance)
+
+
+@receiver(post_init, sender=Building)
+def remember_supervisor(sender, instance, **kwargs):
+    instance._original_supervisor_id = instance.__dict__.get('supervisor_id')
+
+
+@receiver(post_save, sender=Building)
+def move_supervisor_counters(sender, instance, created, raw=False, **kwargs):
+    """Reassigning a building moves its totals between supervisor scopes."""
+    previous = getattr(instance, '_original_supervisor_id', None)
+    if raw or created or previous == instance.supervisor_id:
+        return
+    supervisors = [pk for pk in (previous, instance.supervisor_id) if pk]
+    counters.rebuild_counters(Counter.Scope.SUPERVISOR, supervisors)
+    instance._original_supervisor_id = instance.supervisor_id
+
+
+@receiver([post_save, post_delete], sender=Building)
+def invalidate_supervisor_scopes(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(SCOPE_NAMESPACE))
+
+
+@receiver([post_save, post_delete], sender=Building)
+def invalidate_building_availability(sender, instance, **kwargs):
+    building_ids = [instance.pk]
+    transaction.on_commit(lambda: availability.invalidate(building_ids))
+
+
+@receiver(post_init, sender=Room)
+def remember_room_building(sender, instance, **kwargs):
+    instance._original_building_id = instance.__dict__.get('building_id')
+
+
+# Connected before invalidate_scopes_on_room_move, which resets _original_building_id.
+@receiver([post_save, post_delete], sender=Room)
+def invalidate_room_availability(sender, instance, **kwargs):
+    building_ids = [instance.building_id, getattr(instance, '_original_building_id', None)]
+    transaction.on_commit(lambda: availability.invalidate(building_ids))
+
+
+@receiver(post_save, sender=Room)
+def invalidate_scopes_on_room_move(sender, instance, created, **kwargs):
+    """Occupancy updates keep the scope; new or relocated rooms do not."""
+    if created or instance._original_building_id != instance.building_id:
+        transaction.on_commit(lambda: bump_version(SCOPE_NAMESPACE))
+    instance._original_building_id = instance.building_id
+
+
+@receiver(post_delete, sender=Room)
+def invalidate_scopes_on_room_delete(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(SCOPE_NAMESPACE))
@@ -0,0 +1,51 @@
+"""
+Headline statistics for the admin dashboard.
+
+Totals are read from the global counters kept by ``core.counters``.
+The applications chart is read from the ``core.rollups`` table and free
+beds from the ``housing.availability`` index. The combined snapshot is
+cached in the ``stats`` namespace; the receivers in ``core.signals``
+bump that namespace whenever one of the counted models is saved or
+deleted.
+"""
+from applications.models import HousingApplication
+from housing.availability import free_beds
+
+from .cache import get_or_set
+from .counters import read_counters
+from .rollups import monthly_series
+
+STATS_NAMESPACE = 'stats'
+STATS_TIMEOUT = 60 * 15
+
+
+def monthly_applications(months=6):
+    """Return chart labels and counts of applications per month."""
+    app_labels, app_data = monthly_series(months)
+    return {'app_labels': app_labels, 'app_data': app_data}
+
+
+def counter_totals():
+    counters = read_counters()
+    occupied = counters.get('rooms.current_occupants', 0)
+    return {
+        'users_count': counters.get('users', 0),
+        'complaints_count': counters.get('complaints', 0),
+        'approved_count': counters.get(f'applications.{HousingApplication.Status.ACCEPTED}', 0),
+        'pending_count': counters.get(f'applications.{HousingApplication.Status.PENDING}', 0),
+        'rejected_count': counters.get(f'applications.{HousingApplication.Status.REJECTED}', 0),
+        # Beds a student can actually be placed in (rooms in maintenance excluded).
+        'occupancy_free': free_beds(),
+        'occupancy_occupied': occupied,
+    }
+
+
+def compute_admin_stats():
+    stats = counter_totals()
+    stats.update(monthly_applications())
+    return stats
+
+
+def get_admin_stats():
+    """Return the cached admin dashboard snapshot, computing it on a miss."""
+    return get_or_set(STATS_NAMESPACE, ['admin'], compute_admin_stats, STATS_TIMEOUT)
@@ -0,0 +1,216 @@
+"""
+Content-addressed media storage.
+
+``ContentAddressedStorage`` names every uploaded file after the SHA-256
+of its bytes (``cas/ab/cd/abcd....png``), whatever ``upload_to`` says,
+so the same photo saved on a user and on their housing application is
+written once and both records point at it. Saving bytes that are
+already stored only costs the hash.
+
+Because a file may be shared, ``delete`` leaves content-addressed files
+in place; ``dedupe_media`` moves files saved before this storage into
+it, makes the thumbnails of images that have none (see core.images),
+and with ``--prune`` removes content no record refers to anymore.
+"""
+import hashlib
+import os
+import uuid
+from collections import namedtuple
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models, transaction
+
+from PIL import Image
+
+from .bulk import update_rows
+from .images import derived_from, save_derivatives
+
+PREFIX = 'cas'
+CHUNK_SIZE = 64 * 1024
+TEMP_PREFIX = '.incoming-'
+
+
+def content_name(digest, extension):
+    return f'{PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_content_name(name):
+    return name.startswith(f'{PREFIX}/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The final name is chosen from the content in _save.
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks(CHUNK_SIZE):
+            digest.update(chunk)
+        name = content_name(digest.hexdigest(), os.path.splitext(name)[1])
+        if self.exists(name):
+            return name
+        return self._write(name, content)
+
+    def save_derivative(self, name, content):
+        """Store ``content`` under ``name`` as given (see core.images)."""
+        return self._write(name, content)
+
+    def _write(self, name, content):
+        """
+        Write ``content`` to a temporary file and move it over ``name``.
+        Concurrent writers of a name write the same bytes, so whichever
+        rename lands last is as good as the first, and readers never see
+        a partly written file. (FileSystemStorage would instead retry
+        under get_available_name, which here returns the same name.)
+        """
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+
+        temporary = os.path.join(directory, f'{TEMP_PREFIX}{uuid.uuid4().hex}')
+        try:
+            fd = os.open(temporary, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+            with os.fdopen(fd, 'wb') as handle:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    handle.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+    def delete(self, name):
+        if name and is_content_name(name):
+            return  # Possibly shared with other records; see dedupe_media --prune.
+        super().delete(name)
+
+
+DedupeReport = namedtuple(
+    'DedupeReport',
+    ['references', 'files', 'missing', 'bytes_before', 'bytes_after', 'pruned', 'thumbnails', 'unreadable'],
+)
+
+
+def _file_fields():
+    """(model, [field names]) for every model with a file field on the default storage."""
+    for model in apps.get_models():
+        fields = [
+            field.name for field in model._meta.concrete_fields
+            if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage)
+        ]
+        if fields:
+            yield model, fields
+
+
+def _size(storage, name):
+    try:
+        return storage.size(name)
+    except OSError:
+        return None
+
+
+def dedupe_media(dry_run=False, prune=False, storage=None):
+    """
+    Move every stored file referenced by a file field into the
+    content-addressed layout, point the records at it and delete the old
+    copies, then write the missing thumbnails of every referenced image.
+    Returns a ``DedupeReport`` (sizes in bytes, ``files`` being the
+    distinct files left, ``thumbnails`` the ones written and
+    ``unreadable`` the images that could not be decoded); with
+    ``dry_run`` nothing changes.
+    """
+    storage = storage or default_storage
+    before = {}  # name a record pointed at -> bytes (None when the file is missing)
+    after = {}  # name a record points at afterwards -> bytes
+    moved = {}  # old name -> content name
+    images = set()  # names referenced by image fields afterwards
+    references = missing = 0
+    updates = []
+
+    for model, fields in _file_fields():
+        image_fields = {name for name in fields if isinstance(model._meta.get_field(name), models.ImageField)}
+        for row in model._default_manager.values_list('pk', *fields).iterator():
+            pk, names = row[0], list(row[1:])
+            changed = False
+            for index, name in enumerate(names):
+                if not name:
+                    continue
+                references += 1
+                if name not in before:
+                    before[name] = _size(storage, name)
+                if before[name] is None:
+                    missing += 1
+                    continue
+                if not is_content_name(name):
+                    if name not in moved:
+                        with storage.open(name, 'rb') as handle:
+                            moved[name] = _hashed_name(handle, name) if dry_run else storage.save(name, File(handle))
+                    names[index] = moved[name]
+                    changed = True
+                after[names[index]] = before[name]
+                if fields[index] in image_fields:
+                    images.add(names[index])
+            if changed:
+                updates.append((model, fields, pk, names))
+
+    bytes_before = sum(size for size in before.values() if size)
+    bytes_after = sum(after.values())
+
+    pruned = thumbnails = unreadable = 0
+    if not dry_run:
+        with transaction.atomic():
+            by_model = {}
+            for model, fields, pk, names in updates:
+                by_model.setdefault((model, tuple(fields)), []).append((pk, names))
+            for (model, fields), rows in by_model.items():
+                update_rows(model, list(fields), rows)
+        for name in moved:
+            storage.delete(name)
+        for name in sorted(images):
+            try:
+                thumbnails += len(save_derivatives(name, storage=storage))
+            except (OSError, Image.DecompressionBombError):
+                unreadable += 1
+        if prune:
+            pruned = _prune(storage, after)
+    return DedupeReport(references, len(after), missing, bytes_before, bytes_after, pruned, thumbnails, unreadable)
+
+
+def _hashed_name(handle, name):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: handle.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return content_name(digest.hexdigest(), os.path.splitext(name)[1])
+
+
+def _prune(storage, referenced):
+    """
+    Delete content-addressed files no record refers to, and derivatives
+    of them. Returns the bytes freed.
+    """
+    originals = {os.path.splitext(name)[0] for name in referenced}
+    freed = 0
+    root = storage.path(PREFIX)
+    for directory, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.startswith(TEMP_PREFIX):
+                continue  # Still being written.
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, storage.location).replace(os.sep, '/')
+            if name not in referenced and derived_from(name) not in originals:
+                freed += os.path.getsize(path)
+                os.remove(path)
+    return freed
@@ -0,0 +1,23 @@
+from django import template
+
+from core.images import DERIVATIVES, derivative_name
+from core.storage import is_content_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail(image, size):
+    """
+    URL of the ``size`` derivative ('avatar', 'list' or 'detail') of an
+    image field's file. Derivatives are written on upload and by
+    ``dedupe_media``, so this only builds the URL; files that predate the
+    content-addressed layout have none and are served as they are.
+    """
+    if size not in DERIVATIVES:
+        raise template.TemplateSyntaxError(f'Unknown thumbnail size {size!r}.')
+    if not image:
+        return ''
+    if not is_content_name(image.name):
+        return image.url
+    return image.storage.url(derivative_name(image.name, size))
@@ -0,0 +1,33 @@
+"""
+Template backend that times renders for the request metrics.
+
+Configured as the ``DjangoTemplates`` backend in ``TEMPLATES``; it
+behaves exactly like Django's own, except that every top-level render
+(includes and parent templates are part of it) adds its duration to the
+current request's ``RequestMetrics``.
+"""
+import time
+
+from django.template.backends import django as django_backend
+
+from .middleware import current_metrics
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_time += time.perf_counter() - start
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
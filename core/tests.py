@@ -0,0 +1,459 @@
+import io
+import tempfile
+import json
+import zipfile
+from pathlib import Path
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.template import Context, Template
+from django.db.models import Sum
+from django.utils import timezone
+from applications.models import HousingApplication
+from complaints.models import Complaint
+from housing.models import Building, Room
+from .benchmarks import compare, percentile
+from .checks import shared_cache_check
+from PIL import Image
+from .counters import compute_counters, read_counter, read_counters, rebuild_counters
+from .middleware import QueryBudgetExceeded
+from .models import ApplicationRollup, Counter
+from .rollups import backfill_rollups, daily_series, monthly_series
+from .scopes import SupervisorScope
+from .stats import get_admin_stats
+from .images import derivative_name, normalize, save_derivatives
+from .storage import ContentAddressedStorage, dedupe_media
+
+User = get_user_model()
+
+
+class AdminStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        building = Building.objects.create(name='A', address='Addr')
+        Room.objects.create(building=building, number='1', capacity=4, current_occupants=1)
+        HousingApplication.objects.create(name='S', phone='1', age=20, governorate="Ibb")
+
+    def test_snapshot_is_cached_until_a_write(self):
+        stats = get_admin_stats()
+        self.assertEqual(stats['users_count'], 1)
+        self.assertEqual(stats['pending_count'], 1)
+        self.assertEqual(stats['occupancy_free'], 3)
+
+        with self.assertNumQueries(0):
+            get_admin_stats()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HousingApplication.objects.create(name='T', phone='2', age=20, governorate="Ibb", status=HousingApplication.Status.ACCEPTED)
+        stats = get_admin_stats()
+        self.assertEqual(stats['pending_count'], 1)
+        self.assertEqual(stats['approved_count'], 1)
+
+    def test_dashboard_renders_from_snapshot(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['users_count'], 1)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        self.supervisor = User.objects.create_user(username='sup', password='p', role=User.Role.SUPERVISOR, governorate="Ibb")
+        self.building = Building.objects.create(name='B', address='Addr', supervisor=self.supervisor)
+        self.room = Room.objects.create(building=self.building, number='1', capacity=2)
+
+    def test_signals_track_status_changes_per_scope(self):
+        application = HousingApplication.objects.create(name='S', phone='1', age=20, governorate="Ibb")
+        self.assertEqual(read_counter('applications.pending'), 1)
+
+        application = HousingApplication.objects.get(pk=application.pk)
+        application.status = HousingApplication.Status.ACCEPTED
+        application.assigned_building = self.building
+        application.save()
+
+        self.assertEqual(read_counter('applications.pending'), 0)
+        self.assertEqual(read_counter('applications.accepted'), 1)
+        self.assertEqual(read_counter('applications.accepted', Counter.Scope.BUILDING, self.building.pk), 1)
+        self.assertEqual(read_counter('applications.accepted', Counter.Scope.SUPERVISOR, self.supervisor.pk), 1)
+
+        application.delete()
+        self.assertEqual(read_counter('applications'), 0)
+
+    def test_rebuild_fixes_drift(self):
+        Room.objects.filter(pk=self.room.pk).update(current_occupants=2)
+        self.assertEqual(read_counter('rooms.current_occupants'), 0)
+
+        drifted = rebuild_counters()
+
+        self.assertEqual(drifted, 3)
+        self.assertEqual(read_counter('rooms.current_occupants'), 2)
+        fresh = compute_counters(Counter.Scope.GLOBAL)
+        self.assertEqual(read_counters(), {name: value for (_, _, name), value in fresh.items()})
+
+    def test_deleting_rooms_and_buildings_unlinks_their_rows(self):
+        Complaint.objects.create(student=self.supervisor, room=self.room, type='Water', description='Leak')
+        HousingApplication.objects.create(
+            name='S', phone='1', age=20, governorate="Ibb",
+            status=HousingApplication.Status.ACCEPTED, assigned_building=self.building, assigned_room=self.room,
+        )
+        self.room.delete()
+        self.assertEqual(read_counter('complaints', Counter.Scope.SUPERVISOR, self.supervisor.pk), 0)
+        self.assertEqual(rebuild_counters(), 0)
+
+        Room.objects.create(building=self.building, number='2', capacity=2)
+        self.building.delete()
+        self.assertEqual(read_counter('applications.accepted', Counter.Scope.SUPERVISOR, self.supervisor.pk), 0)
+        self.assertEqual(read_counter('complaints'), 1)
+        self.assertEqual(rebuild_counters(), 0)
+
+    def test_reassigning_building_moves_supervisor_totals(self):
+        other = User.objects.create_user(username='sup2', password='p', role=User.Role.SUPERVISOR, governorate="Ibb")
+        self.building.supervisor = other
+        self.building.save()
+
+        self.assertEqual(read_counter('rooms', Counter.Scope.SUPERVISOR, self.supervisor.pk), 0)
+        self.assertEqual(read_counter('rooms', Counter.Scope.SUPERVISOR, other.pk), 1)
+
+
+class RollupTests(TestCase):
+    def test_series_is_gap_filled_and_follows_status_changes(self):
+        application = HousingApplication.objects.create(name='S', phone='1', age=20, governorate="Ibb")
+        today = timezone.localdate()
+
+        labels, counts = monthly_series(3, today=today)
+        self.assertEqual(len(labels), 3)
+        self.assertEqual(counts, [0, 0, 1])
+
+        application.status = HousingApplication.Status.REJECTED
+        application.save()
+        self.assertEqual(monthly_series(3, status='pending', today=today)[1], [0, 0, 0])
+        self.assertEqual(monthly_series(3, status='rejected', today=today)[1], [0, 0, 1])
+        self.assertEqual(daily_series(2, governorate="Ibb", today=today)[1], [0, 1])
+
+    def test_backfill_matches_incremental_rows(self):
+        HousingApplication.objects.create(name='S', phone='1', age=20, governorate="Ibb")
+        HousingApplication.objects.create(name='T', phone='2', age=20, governorate="Ibb")
+        incremental = set(ApplicationRollup.objects.values_list('period', 'period_start', 'status', 'governorate', 'count'))
+
+        backfill_rollups()
+
+        rebuilt = set(ApplicationRollup.objects.values_list('period', 'period_start', 'status', 'governorate', 'count'))
+        self.assertEqual(incremental, rebuilt)
+
+
+class SupervisorScopeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.supervisor = User.objects.create_user(username='sup', password='p', role=User.Role.SUPERVISOR, governorate="Ibb")
+        self.building = Building.objects.create(name='B', address='Addr', supervisor=self.supervisor)
+        self.room = Room.objects.create(building=self.building, number='1', capacity=2)
+
+    def test_scope_is_cached_until_rooms_change(self):
+        scope = SupervisorScope.for_user(self.supervisor)
+        self.assertEqual(scope.buildings[0]['room_count'], 1)
+
+        with self.assertNumQueries(0):
+            SupervisorScope.for_user(self.supervisor)
+
+        self.room.current_occupants = 1
+        self.room.save()
+        with self.assertNumQueries(0):
+            SupervisorScope.for_user(self.supervisor)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.create(building=self.building, number='2', capacity=2)
+        scope = SupervisorScope.for_user(self.supervisor)
+        self.assertEqual(scope.buildings[0]['room_count'], 2)
+
+    def test_dashboard_summary(self):
+        Complaint.objects.create(student=self.supervisor, room=self.room, type='Water', description='Leak')
+        elsewhere = Room.objects.create(building=Building.objects.create(name='C', address='Addr'), number='1', capacity=2)
+        Complaint.objects.create(student=self.supervisor, room=elsewhere, type='Water', description='Leak')
+        self.client.force_login(self.supervisor)
+        response = self.client.get(reverse('supervisor_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['my_buildings_count'], 1)
+        self.assertEqual(response.context['active_complaints_count'], 1)
+        self.assertEqual(len(response.context['recent_complaints']), 1)
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        building = Building.objects.create(name='A', address='Addr')
+        Room.objects.create(building=building, number='1', capacity=4, current_occupants=1)
+        Room.objects.create(building=building, number='2', capacity=2, status=Room.Status.MAINTENANCE)
+        self.client.force_login(self.admin)
+
+    def test_reports_page_shows_row_counts(self):
+        response = self.client.get(reverse('reports'))
+        self.assertEqual(response.status_code, 200)
+        counts = {report.slug: report.count() for report in response.context['reports']}
+        self.assertEqual(counts['occupancy'], 1)
+        self.assertEqual(counts['complaint-backlog'], 0)
+
+    def test_csv_export_streams_rows(self):
+        response = self.client.get(reverse('report_export', args=['occupancy', 'csv']))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[1], 'A,,2,6,1,5,1')
+
+    def test_xlsx_export_is_a_workbook(self):
+        response = self.client.get(reverse('report_export', args=['occupancy', 'xlsx']))
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertIn('<row r="2">', sheet)
+        self.assertIn('<c><v>6</v></c>', sheet)
+
+    def test_unknown_format_is_404(self):
+        response = self.client.get(reverse('report_export', args=['occupancy', 'pdf']))
+        self.assertEqual(response.status_code, 404)
+
+
+class SharedCacheCheckTests(TestCase):
+    def test_per_process_cache_warns_outside_debug(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(DEBUG=False, CACHES=locmem):
+            self.assertEqual([warning.id for warning in shared_cache_check(None)], ['core.W001'])
+        with override_settings(DEBUG=False, CACHES=redis):
+            self.assertEqual(shared_cache_check(None), [])
+
+
+@override_settings(QUERY_BUDGETS={'admin_dashboard': 1}, QUERY_BUDGET_RAISE=True)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(self.admin)
+
+    def test_server_timing_header(self):
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            response = self.client.get(reverse('reports'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['view'], 'reports')
+        self.assertGreater(line['queries'], 0)
+
+    def test_over_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('admin_dashboard'))
+
+    def test_streamed_body_is_measured(self):
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            response = self.client.get(reverse('report_export', args=['occupancy', 'csv']))
+            self.assertEqual(logs.records, [])
+            b''.join(response.streaming_content)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['view'], 'report_export')
+        self.assertGreater(line['queries'], 2)  # Session and user, then the report's own.
+        self.assertNotIn('Server-Timing', response)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(self.admin)
+
+    def profiles(self):
+        return sorted(path.name.rsplit('.', 1)[1] for path in Path(self.directory.name).rglob('*.*'))
+
+    def test_superuser_opt_in(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory.name):
+            self.client.get(reverse('reports'))
+            self.assertEqual(self.profiles(), [])
+            self.client.get(reverse('reports') + '?profile')
+        self.assertEqual(self.profiles(), ['prof', 'txt'])
+        summary = next(Path(self.directory.name, 'reports').glob('*.txt')).read_text()
+        self.assertIn('cumulative', summary)
+
+    def test_disabled_ignores_opt_in(self):
+        with override_settings(PROFILING_ENABLED=False, PROFILING_DIR=self.directory.name):
+            self.client.get(reverse('reports') + '?profile')
+        self.assertEqual(self.profiles(), [])
+
+
+class SeedCampusTests(TestCase):
+    def seed(self, prefix):
+        call_command(
+            'seed_campus', students=40, buildings=2, rooms_per_building=20,
+            complaints=5, seed=7, prefix=prefix, stdout=io.StringIO(),
+        )
+
+    def test_seeds_every_model_consistently(self):
+        self.seed('a')
+        self.assertEqual(User.objects.filter(role=User.Role.STUDENT).count(), 40)
+        self.assertEqual(HousingApplication.objects.filter(status='accepted').count(), 24)
+        self.assertEqual(Room.objects.aggregate(total=Sum('current_occupants'))['total'], 24)
+        self.assertEqual(Complaint.objects.count(), 5)
+        self.assertEqual(read_counter('applications.accepted'), 24)
+        self.assertFalse(User.objects.filter(role=User.Role.STUDENT, current_application__isnull=True).exists())
+
+    def test_same_seed_gives_same_data(self):
+        self.seed('a')
+        self.seed('b')
+        governorates = lambda prefix: list(
+            User.objects.filter(username__startswith=f'{prefix}-student-').order_by('pk').values_list('governorate', flat=True)
+        )
+        self.assertEqual(governorates('a'), governorates('b'))
+
+
+class BenchmarkCompareTests(TestCase):
+    def measurement(self, p95, queries):
+        return {'p50_ms': p95, 'p95_ms': p95, 'max_ms': p95, 'queries': queries, 'bytes': 0}
+
+    def test_percentile(self):
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 0.5), 3)
+        self.assertEqual(percentile([5, 1, 3, 2, 4], 0.95), 5)
+
+    def test_flags_slower_views_and_extra_queries(self):
+        baseline = {'1000': {'a': self.measurement(100, 5), 'b': self.measurement(100, 5), 'c': self.measurement(1, 5)}}
+        results = {'1000': {'a': self.measurement(200, 5), 'b': self.measurement(101, 6), 'c': self.measurement(3, 5)}}
+        rows = {row['view']: row['regressions'] for row in compare(results, baseline)}
+        self.assertEqual(len(rows['a']), 1)
+        self.assertEqual(rows['b'], ['queries 5 -> 6'])
+        self.assertEqual(rows['c'], [])
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.root = Path(media.name)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def files(self):
+        return sorted(str(path.relative_to(self.root)) for path in self.root.rglob('*') if path.is_file())
+
+    def test_identical_uploads_are_stored_once(self):
+        photo = ContentFile(b'photo bytes', name='me.PNG')
+        user = User.objects.create_user(username='s', password='password', governorate="Ibb", profile_photo=photo)
+        application = HousingApplication.objects.create(
+            student=user, name='S', phone='1', age=20, governorate="Ibb",
+            profile_image=ContentFile(b'photo bytes', name='other.png'),
+            university_card_image=ContentFile(b'card bytes', name='card.png'),
+        )
+        self.assertEqual(application.profile_image.name, user.profile_photo.name)
+        self.assertRegex(user.profile_photo.name, r'^cas/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(len(self.files()), 2)
+
+        application.profile_image.delete(save=False)  # Shared: left in place.
+        self.assertEqual(user.profile_photo.read(), b'photo bytes')
+
+    def test_concurrent_writer_of_the_same_content(self):
+        storage = ContentAddressedStorage()
+        storage.exists = lambda name: False  # Both writers checked before either wrote.
+        first = storage.save('a.png', ContentFile(b'same bytes'))
+        self.assertEqual(storage.save('b.png', ContentFile(b'same bytes')), first)
+        self.assertEqual(self.files(), [first])
+        self.assertEqual(storage.open(first).read(), b'same bytes')
+
+    def test_dedupe_existing_media(self):
+        for name in ('users/profiles/a.png', 'applications/profiles/a.png', 'applications/ids/b.png'):
+            (self.root / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.root / name).write_bytes(b'x' * 100 if 'ids' not in name else b'y' * 50)
+        user = User.objects.create_user(username='s', password='password', governorate="Ibb")
+        User.objects.filter(pk=user.pk).update(profile_photo='users/profiles/a.png')
+        HousingApplication.objects.create(student=user, name='S', phone='1', age=20, governorate="Ibb")
+        HousingApplication.objects.update(
+            profile_image='applications/profiles/a.png', university_card_image='applications/ids/b.png',
+        )
+
+        out = io.StringIO()
+        call_command('dedupe_media', '--dry-run', stdout=out)
+        self.assertIn('Would reclaim 100', out.getvalue())
+        self.assertEqual(len(self.files()), 3)
+
+        report = dedupe_media()
+        self.assertEqual((report.references, report.files, report.bytes_before, report.bytes_after), (3, 2, 250, 150))
+        self.assertEqual([name[:4] for name in self.files()], ['cas/', 'cas/'])
+        application = HousingApplication.objects.get()
+        self.assertEqual(application.profile_image.name, User.objects.get(pk=user.pk).profile_photo.name)
+        self.assertEqual(application.university_card_image.read(), b'y' * 50)
+
+        HousingApplication.objects.update(university_card_image='')
+        self.assertEqual(dedupe_media(prune=True).pruned, 50)
+        self.assertEqual(len(self.files()), 1)
+
+
+class ImagePipelineTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.root = Path(media.name)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def photo(self, size=(3000, 2000), mode='RGB', fmt='JPEG', **save_args):
+        out = io.BytesIO()
+        Image.new(mode, size, 'red').save(out, fmt, **save_args)
+        return ContentFile(out.getvalue(), name=f'phone.{fmt.lower()}')
+
+    def test_normalize_downscales_and_strips_exif(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotated 90 degrees.
+        exif[0x010F] = 'PhoneMaker'
+        result = normalize(self.photo(exif=exif))
+        self.assertEqual(result.name, 'phone.jpg')
+        image = Image.open(result)
+        self.assertEqual(image.size, (1365, 2048))  # Upright and within MAX_DIMENSION.
+        self.assertEqual(dict(image.getexif()), {})
+
+        self.assertTrue(normalize(self.photo((40, 40), 'RGBA', 'PNG')).name.endswith('.png'))
+
+    def test_rejects_decompression_bombs_and_garbage(self):
+        bomb = self.photo((10000, 6000), mode='1', fmt='PNG')  # 60 MP in a few kilobytes.
+        self.assertLess(bomb.size, 100_000)
+        with self.assertRaises(ValidationError) as raised:
+            normalize(bomb)
+        self.assertEqual(raised.exception.code, 'too_many_pixels')
+        with self.assertRaises(ValidationError):
+            normalize(ContentFile(b'not an image', name='x.jpg'))
+
+    def test_derivatives_and_thumbnail_tag(self):
+        user = User.objects.create_user(
+            username='s', password='password', governorate="Ibb", profile_photo=normalize(self.photo()),
+        )
+        names = save_derivatives(user.profile_photo.name)
+        self.assertEqual(names['avatar'], derivative_name(user.profile_photo.name, 'avatar'))
+        self.assertEqual(Image.open(self.root / names['avatar']).size, (64, 64))
+        self.assertLess((self.root / names['list']).stat().st_size, user.profile_photo.size / 10)
+
+        html = Template("{% load images %}{% thumbnail user.profile_photo 'list' %}").render(Context({'user': user}))
+        self.assertTrue(html.endswith(names['list']))
+
+        self.assertEqual(save_derivatives(user.profile_photo.name), {})  # Nothing left to write.
+
+        # Derivatives live as long as the original does.
+        self.assertEqual(dedupe_media(prune=True).pruned, 0)
+        User.objects.update(profile_photo='')
+        dedupe_media(prune=True)
+        self.assertEqual(list(self.root.rglob('*.jpg')), [])
+
+    def test_dedupe_writes_thumbnails_of_older_uploads(self):
+        legacy = self.root / 'users/profiles/me.jpg'
+        legacy.parent.mkdir(parents=True)
+        legacy.write_bytes(self.photo((400, 300)).read())
+        user = User.objects.create_user(username='s', password='password', governorate="Ibb")
+        User.objects.filter(pk=user.pk).update(profile_photo='users/profiles/me.jpg')
+
+        render = Template("{% load images %}{% thumbnail user.profile_photo 'avatar' %}").render
+        user.refresh_from_db()
+        self.assertTrue(render(Context({'user': user})).endswith('users/profiles/me.jpg'))  # No thumbnails yet.
+
+        report = dedupe_media()
+        self.assertEqual((report.thumbnails, report.unreadable), (3, 0))
+        user.refresh_from_db()
+        url = render(Context({'user': user}))
+        self.assertTrue(url.endswith('.avatar.jpg'))
+        self.assertTrue((self.root / derivative_name(user.profile_photo.name, 'avatar')).exists())
@@ -0,0 +1,52 @@
+"""
+Loaded-versus-saved state of model instances.
+
+The counter store and the application rollups both keep a derived table
+in step with saves: they remember the fields they depend on when an
+instance is loaded and apply the difference once it is saved (or its
+removal once it is deleted). ``StateTracker`` does that bookkeeping for
+both without reading fields a query deferred.
+"""
+
+UNKNOWN = object()
+
+
+class StateTracker:
+    def __init__(self, attribute, fields):
+        self.attribute = attribute  # where the loaded state is kept on the instance
+        self.fields = fields  # model -> names of the tracked fields
+
+    def capture(self, instance):
+        """The tracked fields of a saved instance; deferred ones are ``UNKNOWN``."""
+        if instance.pk is None:
+            return None
+        return {field: instance.__dict__.get(field, UNKNOWN) for field in self.fields(type(instance))}
+
+    def load(self, model, pk):
+        return model._default_manager.filter(pk=pk).values(*self.fields(model)).first()
+
+    def remember(self, instance):
+        """post_init: keep the state the instance was loaded with."""
+        setattr(instance, self.attribute, self.capture(instance))
+
+    def prepare(self, instance):
+        """pre_save: read deferred fields from the row while it still holds the old values."""
+        state = getattr(instance, self.attribute, None)
+        if state is not None and UNKNOWN in state.values():
+            setattr(instance, self.attribute, self.load(type(instance), instance.pk))
+
+    def saved(self, instance, created):
+        """post_save: return the ``(old, new)`` states and remember the new one."""
+        old = None if created else getattr(instance, self.attribute, None)
+        new = self.capture(instance)
+        if UNKNOWN in new.values():
+            new = self.load(type(instance), instance.pk)
+        setattr(instance, self.attribute, new)
+        return old, new
+
+    def deleted(self, instance):
+        """post_delete: the state of the removed row, or ``None`` when deferred fields make it unknowable."""
+        state = getattr(instance, self.attribute, None)
+        if state is None or UNKNOWN in state.values():
+            return None
+        return state
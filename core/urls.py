@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import home, admin_dashboard, supervisor_dashboard, student_dashboard, reports_view, rejected_view
+from .views import home, admin_dashboard, supervisor_dashboard, student_dashboard, reports_view, report_export, rejected_view
 
 urlpatterns = [
     path('', home, name='home'),
@@ -8,4 +8,5 @@ urlpatterns = [
     path('dashboard/student/', student_dashboard, name='student_dashboard'),
     path('rejected/', rejected_view, name='application_rejected'),
     path('reports/', reports_view, name='reports'),
+    path('reports/<slug:slug>/export/<str:fmt>/', report_export, name='report_export'),
 ]
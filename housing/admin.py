@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Building, Room
+from .models import Building, OccupancySnapshot, Room
 
 @admin.register(Building)
 class BuildingAdmin(admin.ModelAdmin):
@@ -12,4 +12,8 @@ class RoomAdmin(admin.ModelAdmin):
     list_filter = ['status', 'building']
     search_fields = ['number', 'building__name']
 
-
+@admin.register(OccupancySnapshot)
+class OccupancySnapshotAdmin(admin.ModelAdmin):
+    list_display = ['date', 'building', 'capacity', 'occupied', 'maintenance_rooms']
+    list_filter = ['building']
+    date_hierarchy = 'date'
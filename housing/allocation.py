@@ -0,0 +1,83 @@
+"""
+Room allocation.
+
+A bed is reserved with one conditional UPDATE: the capacity guard is in
+the WHERE clause and the room is marked occupied in the same statement
+when it takes its last bed, so concurrent reviewers can never overbook
+a room and never need a lock wider than the row itself.
+
+``allocate`` runs the reservation and the caller's bookkeeping in one
+transaction and retries the whole transaction when SQLite reports the
+database as locked. The UPDATE is issued first so the transaction takes
+its write lock before reading anything, which lets SQLite wait on the
+busy timeout instead of failing with a deadlock.
+"""
+import random
+import time
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, F, Value, When
+
+from core.cache import bump_version
+from core.counters import record_change
+from core.stats import STATS_NAMESPACE
+
+from . import availability
+from .models import Room
+
+LOCK_RETRIES = 5
+LOCK_BACKOFF = 0.05  # seconds, doubled on every retry
+
+
+class RoomUnavailable(Exception):
+    pass
+
+
+def reserve_bed(room):
+    """
+    Take one bed in ``room`` (an instance or pk). Must run inside a
+    transaction; raises ``RoomUnavailable`` when the room is full or not
+    available.
+    """
+    room_id = getattr(room, 'pk', room)
+    reserved = Room.objects.filter(
+        pk=room_id, status=Room.Status.AVAILABLE, current_occupants__lt=F('capacity'),
+    ).update(
+        current_occupants=F('current_occupants') + 1,
+        # SET expressions see the old row, so "one bed left" means full after this update.
+        status=Case(
+            When(current_occupants__gte=F('capacity') - 1, then=Value(Room.Status.OCCUPIED)),
+            default=F('status'),
+        ),
+    )
+    if not reserved:
+        raise RoomUnavailable('Selected room is full or unavailable.')
+
+    new = Room.objects.filter(pk=room_id).values('status', 'capacity', 'current_occupants', 'building_id').get()
+    old = {**new, 'status': Room.Status.AVAILABLE, 'current_occupants': new['current_occupants'] - 1}
+    record_change(Room, old, new)
+    transaction.on_commit(lambda: (bump_version(STATS_NAMESPACE), availability.invalidate([new['building_id']])))
+    return new
+
+
+def _is_lock_error(exc):
+    return 'locked' in str(exc) or 'deadlock' in str(exc).lower()
+
+
+def allocate(room, then=None):
+    """
+    Reserve a bed in ``room`` and call ``then()`` in the same
+    transaction, retrying on lock contention. Returns the result of
+    ``then()``; raises ``RoomUnavailable`` (with nothing saved) when the
+    room has no free bed.
+    """
+    for attempt in range(LOCK_RETRIES + 1):
+        try:
+            with transaction.atomic():
+                reserve_bed(room)
+                return then() if then else None
+        except OperationalError as exc:
+            # Inside an outer transaction the whole unit has to be retried by the caller.
+            if attempt == LOCK_RETRIES or connection.in_atomic_block or not _is_lock_error(exc):
+                raise
+            time.sleep(LOCK_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
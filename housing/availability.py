@@ -0,0 +1,193 @@
+"""
+Free-bed availability index.
+
+For every building the cache holds the rooms that can take a student
+(status available, fewer occupants than beds), in allocation order and
+grouped by capacity; a second entry holds free-bed totals per building,
+gender designation and capacity. Lookups are dictionary reads; a miss
+costs one indexed query for the building (or one grouped query for the
+totals).
+
+Entries are versioned per building, so a bed taken in one building does
+not evict the others. ``version_stamp`` and ``last_modified`` expose that
+version to HTTP clients as validators. ``invalidate`` is called from the Room and
+Building signals and by the code paths that bypass them (allocation,
+provisioning, seeding).
+"""
+import re
+from itertools import islice
+
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from core.cache import bump_version, get_or_set, get_version
+
+from .models import Building, Room
+
+AVAILABILITY_NAMESPACE = 'availability'
+AVAILABILITY_TIMEOUT = 60 * 60
+
+
+def _building_namespace(building_id):
+    return f'{AVAILABILITY_NAMESPACE}.building.{building_id}'
+
+
+def _open_rooms():
+    return Room.objects.filter(status=Room.Status.AVAILABLE, current_occupants__lt=F('capacity'))
+
+
+def invalidate(building_ids=None):
+    """Drop the index of the given buildings (all buildings if ``None``) and the totals."""
+    if building_ids is None:
+        bump_version(AVAILABILITY_NAMESPACE)
+        return
+    for building_id in set(building_ids):
+        if building_id is not None:
+            bump_version(_building_namespace(building_id))
+    bump_version(f'{AVAILABILITY_NAMESPACE}.totals')
+
+
+def _compute_building(building_id):
+    rooms = [
+        {'id': pk, 'number': number, 'capacity': capacity, 'free': free}
+        for pk, number, capacity, free in _open_rooms()
+        .filter(building_id=building_id)
+        .annotate(free=F('capacity') - F('current_occupants'))
+        .order_by('number')
+        .values_list('pk', 'number', 'capacity', 'free')
+    ]
+    by_capacity = {}
+    for room in rooms:
+        by_capacity.setdefault(room['capacity'], []).append(room)
+    return {'rooms': rooms, 'by_capacity': by_capacity, 'computed_at': timezone.now()}
+
+
+def _building_index(building_id):
+    return get_or_set(
+        _building_namespace(building_id), ['rooms', get_version(AVAILABILITY_NAMESPACE)],
+        lambda: _compute_building(building_id), AVAILABILITY_TIMEOUT,
+    )
+
+
+def open_rooms(building_id, capacity=None):
+    """Every room with a free bed in the building, ordered by number."""
+    index = _building_index(building_id)
+    return index['rooms'] if capacity is None else index['by_capacity'].get(capacity, [])
+
+
+def version_stamp(building_id):
+    """An opaque string that changes whenever the building's open rooms may have changed."""
+    return f'{get_version(AVAILABILITY_NAMESPACE)}.{get_version(_building_namespace(building_id))}'
+
+
+def last_modified(building_id):
+    """When the building's cached index was built; never earlier than its last change."""
+    return _building_index(building_id)['computed_at']
+
+
+def next_rooms(building_id, count=1, capacity=None, min_free=1):
+    """The first ``count`` rooms in the building with at least ``min_free`` free beds."""
+    rooms = open_rooms(building_id, capacity)
+    if min_free > 1:
+        rooms = (room for room in rooms if room['free'] >= min_free)
+    return list(islice(rooms, count))
+
+
+def _compute_totals():
+    totals = {
+        pk: {'name': name, 'gender': gender, 'free': 0, 'rooms': 0, 'by_capacity': {}}
+        for pk, name, gender in Building.objects.order_by('name').values_list('pk', 'name', 'gender')
+    }
+    rows = (
+        _open_rooms().values('building_id', 'capacity')
+        .annotate(free=Sum(F('capacity') - F('current_occupants')), rooms=Count('id'))
+        .order_by()
+    )
+    for row in rows:
+        building = totals[row['building_id']]
+        building['free'] += row['free']
+        building['rooms'] += row['rooms']
+        building['by_capacity'][row['capacity']] = row['free']
+    return totals
+
+
+def free_beds_by_building():
+    """
+    ``{building id: {'name', 'gender', 'free', 'rooms', 'by_capacity'}}``
+    for every building, in name order.
+    """
+    return get_or_set(
+        f'{AVAILABILITY_NAMESPACE}.totals', ['buildings', get_version(AVAILABILITY_NAMESPACE)],
+        _compute_totals, AVAILABILITY_TIMEOUT,
+    )
+
+
+def free_beds(gender=None, capacity=None):
+    """
+    Total free beds, optionally only where a student of ``gender`` may
+    live (buildings designated for that gender or mixed) and only in
+    rooms of ``capacity`` beds.
+    """
+    total = 0
+    for building in free_beds_by_building().values():
+        if gender and building['gender'] not in ('', gender):
+            continue
+        total += building['free'] if capacity is None else building['by_capacity'].get(capacity, 0)
+    return total
+
+
+# One character per room in the heatmap.
+HEATMAP_STATES = {'E': 'Empty', 'P': 'Partly occupied', 'F': 'Full', 'M': 'Maintenance'}
+
+_FLOOR = re.compile(r'^(\d+)\d\d')
+
+
+def _floor(number):
+    """``'1203'`` is on floor ``'12'``; numbers without a floor prefix share floor ``''``."""
+    match = _FLOOR.match(number)
+    return match.group(1) if match else ''
+
+
+def _room_state(status, capacity, occupants):
+    if status == Room.Status.MAINTENANCE:
+        return 'M'
+    if status == Room.Status.OCCUPIED or occupants >= capacity:
+        return 'F'
+    return 'P' if occupants else 'E'
+
+
+def _compute_heatmap(building_id):
+    rooms = sorted(
+        (
+            (_floor(number), number, _room_state(status, capacity, occupants))
+            for number, status, capacity, occupants in Room.objects.filter(building_id=building_id)
+            .values_list('number', 'status', 'capacity', 'current_occupants')
+        ),
+        key=lambda room: (len(room[0]), room[0], len(room[1]), room[1]),
+    )
+    floors = []
+    for offset, (floor, _, _) in enumerate(rooms):
+        if not floors or floors[-1][0] != floor:
+            floors.append([floor, offset, 0])
+        floors[-1][2] += 1
+    states = ''.join(state for _, _, state in rooms)
+    return {
+        'building': building_id,
+        'states': states,
+        'numbers': [number for _, number, _ in rooms],
+        'floors': floors,
+        'counts': {state: states.count(state) for state in HEATMAP_STATES},
+    }
+
+
+def heatmap(building_id):
+    """
+    The state of every room in the building, compactly encoded:
+    ``states`` holds one ``HEATMAP_STATES`` character per room, ordered
+    by floor then number; ``numbers`` holds the room numbers in the same
+    order, and ``floors`` lists ``[floor, offset, count]`` slices of both.
+    """
+    return get_or_set(
+        _building_namespace(building_id), ['heatmap', get_version(AVAILABILITY_NAMESPACE)],
+        lambda: _compute_heatmap(building_id), AVAILABILITY_TIMEOUT,
+    )
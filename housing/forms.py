@@ -1,15 +1,19 @@
+import io
+
 from django import forms
 from .models import Building, Room
+from .provisioning import DEFAULT_FORMAT, MAX_ROOMS, ProvisionError, check_number_format, csv_rooms, pattern_rooms
 
 class BuildingForm(forms.ModelForm):
     class Meta:
         model = Building
-        fields = ['name', 'address', 'description', 'supervisor']
+        fields = ['name', 'address', 'description', 'supervisor', 'gender']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'form-control'}),
             'address': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'supervisor': forms.Select(attrs={'class': 'form-select'}),
+            'gender': forms.Select(attrs={'class': 'form-select'}),
         }
 
 class RoomForm(forms.ModelForm):
@@ -22,3 +26,105 @@ class RoomForm(forms.ModelForm):
             'capacity': forms.NumberInput(attrs={'class': 'form-control'}),
             'status': forms.Select(attrs={'class': 'form-select'}),
         }
+
+
+class RoomFilterForm(forms.Form):
+    SORT_CHOICES = [
+        ('building', 'Building / number'),
+        ('free', 'Most free beds'),
+        ('capacity', 'Largest capacity'),
+    ]
+
+    status = forms.ChoiceField(
+        choices=[('', 'All statuses')] + Room.Status.choices, required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    building = forms.ModelChoiceField(
+        queryset=Building.objects.only('name').order_by('name'), required=False, empty_label='All buildings',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    min_free = forms.IntegerField(
+        min_value=1, required=False, label='Min free beds',
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    capacity = forms.IntegerField(
+        min_value=1, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES, required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+
+
+class RoomProvisionForm(forms.Form):
+    """Bulk-create rooms from a floor/number pattern or a CSV upload."""
+    MAX_ROOMS = MAX_ROOMS
+    # Generous for MAX_ROOMS rows of number, capacity and status.
+    MAX_CSV_BYTES = 2 * 1024 * 1024
+
+    building = forms.ModelChoiceField(
+        queryset=Building.objects.order_by('name'),
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    source = forms.ChoiceField(
+        choices=[('pattern', 'Floor / number pattern'), ('csv', 'CSV upload')], initial='pattern',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    floor_from = forms.IntegerField(min_value=0, initial=1, required=False, widget=forms.NumberInput(attrs={'class': 'form-control'}))
+    floor_to = forms.IntegerField(min_value=0, initial=1, required=False, widget=forms.NumberInput(attrs={'class': 'form-control'}))
+    number_from = forms.IntegerField(min_value=0, initial=1, required=False, widget=forms.NumberInput(attrs={'class': 'form-control'}))
+    number_to = forms.IntegerField(min_value=0, initial=50, required=False, widget=forms.NumberInput(attrs={'class': 'form-control'}))
+    number_format = forms.CharField(
+        initial=DEFAULT_FORMAT, required=False, help_text='Uses {floor} and {number}, e.g. {floor}{number:02d} gives 101.',
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+    )
+    capacity = forms.IntegerField(min_value=1, initial=2, widget=forms.NumberInput(attrs={'class': 'form-control'}))
+    csv_file = forms.FileField(
+        required=False, label='CSV file', help_text='Columns: number, capacity (optional), status (optional).',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}),
+    )
+    dry_run = forms.BooleanField(
+        required=False, label='Dry run (validate only)',
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('source') == 'csv':
+            if not cleaned_data.get('csv_file'):
+                self.add_error('csv_file', 'Choose a CSV file to upload.')
+            elif cleaned_data['csv_file'].size > self.MAX_CSV_BYTES:
+                self.add_error('csv_file', f'The file may be at most {self.MAX_CSV_BYTES // (1024 * 1024)} MB.')
+            return cleaned_data
+
+        for start, end in (('floor_from', 'floor_to'), ('number_from', 'number_to')):
+            if cleaned_data.get(start) is None or cleaned_data.get(end) is None:
+                self.add_error(end, 'Enter both ends of the range.')
+            elif cleaned_data[start] > cleaned_data[end]:
+                self.add_error(end, 'The range ends before it starts.')
+        if self.errors:
+            return cleaned_data
+
+        total = (cleaned_data['floor_to'] - cleaned_data['floor_from'] + 1) * (cleaned_data['number_to'] - cleaned_data['number_from'] + 1)
+        if total > self.MAX_ROOMS:
+            raise forms.ValidationError(f'That is {total} rooms; provision at most {self.MAX_ROOMS} at a time.')
+        number_format = cleaned_data.get('number_format') or DEFAULT_FORMAT
+        try:
+            check_number_format(number_format)
+        except ProvisionError as exc:
+            self.add_error('number_format', str(exc))
+        cleaned_data['number_format'] = number_format
+        return cleaned_data
+
+    def specs(self):
+        data = self.cleaned_data
+        if data['source'] == 'csv':
+            text = data['csv_file'].read().decode('utf-8-sig', errors='replace')
+            return csv_rooms(io.StringIO(text, newline=''), capacity=data['capacity'], max_rooms=self.MAX_ROOMS)
+        return pattern_rooms(
+            range(data['floor_from'], data['floor_to'] + 1),
+            range(data['number_from'], data['number_to'] + 1),
+            data['capacity'],
+            data['number_format'],
+        )
@@ -0,0 +1,87 @@
+"""
+Occupancy history.
+
+``capture_snapshots`` stores one ``OccupancySnapshot`` row per building
+per day (beds, occupied beds, rooms in maintenance) from a single grouped
+query; capturing the same day again overwrites it. At a hundred
+buildings that is under 40k small rows a year, a few megabytes.
+
+``occupancy_history`` reads a date range for one building or the whole
+campus and downsamples it to days, weeks or months for charts: each
+bucket reports the average beds and occupied beds over the days captured
+in it, and the peak.
+"""
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Building, OccupancySnapshot
+
+BUCKETS = ('day', 'week', 'month')
+
+
+def capture_snapshots(day=None):
+    """Record today's (or ``day``'s) occupancy of every building. Returns the row count."""
+    day = day or timezone.localdate()
+    rows = [
+        OccupancySnapshot(
+            building_id=pk, date=day, capacity=capacity, occupied=occupied, maintenance_rooms=maintenance,
+        )
+        for pk, capacity, occupied, maintenance in Building.objects.with_occupancy().order_by().values_list(
+            'pk', 'total_capacity', 'occupied_beds', 'maintenance_rooms',
+        )
+    ]
+    OccupancySnapshot.objects.bulk_create(
+        rows, batch_size=500, update_conflicts=True,
+        unique_fields=['building', 'date'], update_fields=['capacity', 'occupied', 'maintenance_rooms'],
+    )
+    return len(rows)
+
+
+def _bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def occupancy_history(start, end, building=None, bucket='day'):
+    """
+    Occupancy from ``start`` to ``end`` (inclusive) of one building (an
+    instance or pk) or, with ``building=None``, of the whole campus.
+    Returns a list of ``{'date', 'capacity', 'occupied', 'peak', 'rate'}``
+    per ``bucket`` (``'day'``, ``'week'`` or ``'month'``) that has
+    snapshots, oldest first; ``date`` is the first day of the bucket and
+    ``rate`` the average occupancy in percent.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f'Unknown bucket {bucket!r}; expected one of {", ".join(BUCKETS)}.')
+    snapshots = OccupancySnapshot.objects.filter(date__gte=start, date__lte=end)
+    if building is not None:
+        snapshots = snapshots.filter(building=building)
+    days = (
+        snapshots.values('date')
+        .annotate(capacity=Sum('capacity'), occupied=Sum('occupied'))
+        .order_by('date')
+        .values_list('date', 'capacity', 'occupied')
+    )
+
+    series = []
+    for day, capacity, occupied in days:
+        key = _bucket_start(day, bucket)
+        if not series or series[-1]['date'] != key:
+            series.append({'date': key, 'days': 0, 'capacity': 0, 'occupied': 0, 'peak': 0})
+        point = series[-1]
+        point['days'] += 1
+        point['capacity'] += capacity
+        point['occupied'] += occupied
+        point['peak'] = max(point['peak'], occupied)
+
+    for point in series:
+        days_captured = point.pop('days')
+        point['capacity'] = round(point['capacity'] / days_captured)
+        point['occupied'] = round(point['occupied'] / days_captured)
+        point['rate'] = round(100 * point['occupied'] / point['capacity'], 1) if point['capacity'] else 0
+    return series
@@ -0,0 +1,16 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from housing.history import capture_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Record the occupancy of every building for today (run daily). Re-running a day overwrites it.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Record under this date (YYYY-MM-DD) instead of today.')
+
+    def handle(self, *args, **options):
+        rows = capture_snapshots(options['date'])
+        self.stdout.write(self.style.SUCCESS(f'Captured occupancy of {rows} buildings.'))
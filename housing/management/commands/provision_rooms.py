@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from housing.models import Building
+from housing.provisioning import DEFAULT_FORMAT, ProvisionError, csv_rooms, pattern_rooms, provision_rooms
+
+
+def int_range(value):
+    """Parse '1-8' (or a single number) into an inclusive range."""
+    start, _, end = value.partition('-')
+    try:
+        start, end = int(start), int(end or start)
+    except ValueError:
+        raise ValueError(f'"{value}" is not a range like 1-8')
+    return range(start, end + 1)
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create rooms in a building from a floor/number pattern or a CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('building', help='Building name or id.')
+        parser.add_argument('--floors', type=int_range, help='Floor range, e.g. 1-8.')
+        parser.add_argument('--numbers', type=int_range, help='Room number range per floor, e.g. 1-50.')
+        parser.add_argument('--format', default=DEFAULT_FORMAT, help='Room number format (default: %(default)s).')
+        parser.add_argument('--capacity', type=int, default=2, help='Beds per room (CSV rows may override).')
+        parser.add_argument('--csv', help='CSV file with number, capacity and status columns.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report without creating rooms.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        building = Building.objects.filter(name=options['building']).first()
+        if building is None and options['building'].isdigit():
+            building = Building.objects.filter(pk=options['building']).first()
+        if building is None:
+            raise CommandError(f'No building named "{options["building"]}".')
+
+        started = time.perf_counter()
+        try:
+            if options['csv']:
+                with open(options['csv'], encoding='utf-8-sig', newline='') as file:
+                    report = provision_rooms(
+                        building, csv_rooms(file, options['capacity']),
+                        dry_run=options['dry_run'], batch_size=options['batch_size'],
+                    )
+            elif options['floors'] and options['numbers']:
+                specs = pattern_rooms(options['floors'], options['numbers'], options['capacity'], options['format'])
+                report = provision_rooms(building, specs, dry_run=options['dry_run'], batch_size=options['batch_size'])
+            else:
+                raise CommandError('Give either --csv or both --floors and --numbers.')
+        except ProvisionError as exc:
+            raise CommandError(str(exc))
+
+        for label, reason in report.conflicts:
+            self.stdout.write(self.style.WARNING(f'{label}: {reason}'))
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {report.created} rooms in {building} ({len(report.conflicts)} skipped) '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from housing.reconciliation import reconcile_occupancy
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every room\'s occupants from student profiles and accepted applications '
+        'and fix drifted rooms. Safe to schedule nightly.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+        parser.add_argument('--show', type=int, default=50, help='List at most N drifted rooms (default: %(default)s).')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        drifted = reconcile_occupancy(dry_run=options['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        if drifted and options['show']:
+            self.stdout.write(f"{'Building':<25}{'Room':<10}{'Beds':>6}{'Stored':>8}{'Actual':>8}  Status")
+        for drift in drifted[:options['show']]:
+            status = drift.old_status if drift.old_status == drift.new_status else f'{drift.old_status} -> {drift.new_status}'
+            line = f'{drift.building:<25}{drift.number:<10}{drift.capacity:>6}{drift.stored:>8}{drift.actual:>8}  {status}'
+            self.stdout.write(self.style.ERROR(line) if drift.actual > drift.capacity else line)
+        if len(drifted) > options['show']:
+            self.stdout.write(f'... and {len(drifted) - options["show"]} more.')
+
+        overbooked = sum(1 for drift in drifted if drift.actual > drift.capacity)
+        verb = 'Found' if options['dry_run'] else 'Fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(drifted)} drifted rooms ({overbooked} overbooked) in {elapsed:.1f}s.'
+        ))
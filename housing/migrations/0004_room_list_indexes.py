@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:00
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0003_alter_room_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['status', 'building', 'number'], name='room_status_building_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['-capacity', 'id'], name='room_capacity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(models.OrderBy(django.db.models.expressions.CombinedExpression(models.F('capacity'), '-', models.F('current_occupants')), descending=True), models.F('id'), name='room_free_beds_idx'),
+        ),
+    ]
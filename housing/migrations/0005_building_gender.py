@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0004_room_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='building',
+            name='gender',
+            field=models.CharField(blank=True, choices=[('', 'Mixed'), ('M', 'Male'), ('F', 'Female')], default='', max_length=1),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('housing', '0005_building_gender'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupancySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('capacity', models.PositiveIntegerField()),
+                ('occupied', models.PositiveIntegerField()),
+                ('maintenance_rooms', models.PositiveIntegerField(default=0)),
+                ('building', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='housing.building')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='snapshot_date_idx')],
+                'unique_together': {('building', 'date')},
+            },
+        ),
+    ]
@@ -1,13 +1,44 @@
 from django.db import models
 from django.conf import settings
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
 from django.utils.translation import gettext_lazy as _
 
+
+class BuildingQuerySet(models.QuerySet):
+    def with_occupancy(self):
+        """
+        Annotate each building with its room and bed totals and the
+        supervisor's display name, in one grouped query.
+        """
+        capacity = Coalesce(Sum('rooms__capacity'), 0)
+        occupied = Coalesce(Sum('rooms__current_occupants'), 0)
+        full_name = Trim(Concat('supervisor__first_name', Value(' '), 'supervisor__last_name'))
+        return self.annotate(
+            total_rooms=Count('rooms'),
+            total_capacity=capacity,
+            occupied_beds=occupied,
+            free_beds=capacity - occupied,
+            maintenance_rooms=Count('rooms', filter=Q(rooms__status=Room.Status.MAINTENANCE)),
+            supervisor_name=Coalesce(NullIf(full_name, Value('')), F('supervisor__username')),
+        )
+
+
 class Building(models.Model):
+    class Gender(models.TextChoices):
+        MIXED = "", "Mixed"
+        MALE = "M", "Male"
+        FEMALE = "F", "Female"
+
     name = models.CharField(max_length=100, unique=True)
     address = models.TextField()
     description = models.TextField(blank=True)
     supervisor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='supervised_buildings', limit_choices_to={'role': 'SUPERVISOR'})
-    
+    # Which students may be housed here; matches CustomUser.gender values.
+    gender = models.CharField(max_length=1, choices=Gender.choices, blank=True, default=Gender.MIXED)
+
+    objects = BuildingQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
@@ -25,6 +56,15 @@ class Room(models.Model):
 
     class Meta:
         unique_together = ('building', 'number')
+        indexes = [
+            # Back the room_list filters and sort orders (see housing.views.ROOM_SORTS).
+            models.Index(fields=['status', 'building', 'number'], name='room_status_building_idx'),
+            models.Index(fields=['-capacity', 'id'], name='room_capacity_idx'),
+            models.Index(
+                (models.F('capacity') - models.F('current_occupants')).desc(), 'id',
+                name='room_free_beds_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.building.name} - {self.number}"
@@ -33,3 +73,18 @@ class Room(models.Model):
         return self.current_occupants >= self.capacity
 
 
+class OccupancySnapshot(models.Model):
+    """Bed occupancy of one building on one day, captured by housing.history."""
+
+    building = models.ForeignKey(Building, on_delete=models.CASCADE, related_name='snapshots')
+    date = models.DateField()
+    capacity = models.PositiveIntegerField()
+    occupied = models.PositiveIntegerField()
+    maintenance_rooms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('building', 'date')
+        indexes = [models.Index(fields=['date'], name='snapshot_date_idx')]
+
+    def __str__(self):
+        return f"{self.building_id} {self.date}: {self.occupied}/{self.capacity}"
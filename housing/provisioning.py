@@ -0,0 +1,155 @@
+"""
+Bulk room provisioning.
+
+Rooms are described either by a floor/number pattern or by a CSV file
+(``number,capacity,status`` with a header row; ``capacity`` and
+``status`` are optional). ``provision_rooms`` checks the whole batch
+against the building's existing room numbers and against itself in
+memory, inserts the valid rooms with ``bulk_create`` and reports every
+conflict instead of stopping at the first one.
+
+Number formats are user input, so only ``{floor}`` and ``{number}``
+with an optional zero-padded width (``{number:02d}``) are accepted.
+"""
+import csv
+import re
+import string
+
+from django.db import IntegrityError, transaction
+
+from core.cache import bump_version
+from core.counters import record_changes
+from core.scopes import SCOPE_NAMESPACE
+from core.stats import STATS_NAMESPACE
+
+from . import availability
+from .models import Room
+
+DEFAULT_FORMAT = '{floor}{number:02d}'
+NUMBER_MAX_LENGTH = Room._meta.get_field('number').max_length
+MAX_ROOMS = 20000
+FORMAT_FIELDS = {'floor', 'number'}
+FORMAT_SPEC = re.compile(r'(0[1-9])?d?')
+
+
+class ProvisionError(Exception):
+    pass
+
+
+def check_number_format(number_format):
+    """Raise ``ProvisionError`` unless ``number_format`` only uses the allowed placeholders."""
+    try:
+        fields = list(string.Formatter().parse(number_format))
+    except ValueError:
+        fields = None
+    if fields is None or any(
+        name is not None and (name not in FORMAT_FIELDS or conversion or not FORMAT_SPEC.fullmatch(spec))
+        for _, name, spec, conversion in fields
+    ):
+        raise ProvisionError('Use only {floor} and {number} placeholders, optionally zero-padded as in {number:02d}.')
+
+
+class ProvisionReport:
+    def __init__(self, rooms, conflicts):
+        self.rooms = rooms
+        self.conflicts = conflicts  # [(line or room number, reason)]
+
+    @property
+    def created(self):
+        return len(self.rooms)
+
+
+def pattern_rooms(floors, numbers, capacity, number_format=DEFAULT_FORMAT):
+    """
+    Yield ``(label, fields)`` for every floor/number combination, e.g.
+    floors ``range(1, 9)`` and numbers ``range(1, 51)`` give 101-850.
+    """
+    check_number_format(number_format)
+    for floor in floors:
+        for number in numbers:
+            label = number_format.format(floor=floor, number=number)
+            yield label, {'number': label, 'capacity': capacity}
+
+
+def csv_rooms(file, capacity=1, max_rooms=MAX_ROOMS):
+    """
+    Yield ``(line, fields)`` for every CSV row, or ``(line, error)`` for
+    rows that cannot be read. ``file`` is a text file object; a file
+    with more than ``max_rooms`` rows raises ``ProvisionError``.
+    """
+    reader = csv.DictReader(file)
+    if not reader.fieldnames or 'number' not in [name.strip().lower() for name in reader.fieldnames]:
+        yield 1, 'The header row must contain a "number" column.'
+        return
+    statuses = {value for value, _ in Room.Status.choices}
+    for count, row in enumerate(reader, 1):
+        if count > max_rooms:
+            raise ProvisionError(f'The file has more than {max_rooms} rooms; split it up.')
+        line = f'line {reader.line_num}'
+        if None in row:  # DictReader files the cells beyond the header under None.
+            yield line, 'too many columns'
+            continue
+        row = {key.strip().lower(): (value or '').strip() for key, value in row.items()}
+        try:
+            room_capacity = int(row.get('capacity') or capacity)
+        except ValueError:
+            yield line, f'invalid capacity "{row["capacity"]}"'
+            continue
+        status = (row.get('status') or Room.Status.AVAILABLE).lower()
+        if room_capacity < 1:
+            yield line, 'capacity must be at least 1'
+        elif status not in statuses:
+            yield line, f'unknown status "{status}"'
+        else:
+            yield line, {'number': row.get('number', ''), 'capacity': room_capacity, 'status': status}
+
+
+def provision_rooms(building, specs, dry_run=False, batch_size=500):
+    """
+    Create the rooms described by ``specs`` (as yielded by
+    ``pattern_rooms`` or ``csv_rooms``) in ``building``. Raises
+    ``ProvisionError`` (with nothing created) for unusable input or when
+    some of the numbers were created by someone else in the meantime.
+    """
+    existing = set(building.rooms.values_list('number', flat=True))
+    seen = set()
+    rooms, conflicts = [], []
+    for label, fields in specs:
+        if isinstance(fields, str):
+            conflicts.append((label, fields))
+            continue
+        number = fields['number']
+        if not number:
+            conflicts.append((label, 'missing room number'))
+        elif len(number) > NUMBER_MAX_LENGTH:
+            conflicts.append((label, f'room number "{number}" is longer than {NUMBER_MAX_LENGTH} characters'))
+        elif number in existing:
+            conflicts.append((label, f'room {number} already exists'))
+        elif number in seen:
+            conflicts.append((label, f'room {number} appears more than once'))
+        else:
+            seen.add(number)
+            rooms.append(Room(building=building, **fields))
+
+    if rooms and not dry_run:
+        try:
+            with transaction.atomic():
+                _create(building, rooms, batch_size)
+        except IntegrityError:
+            raise ProvisionError(f'Rooms were added to {building} meanwhile; run the provisioning again.')
+    return ProvisionReport(rooms, conflicts)
+
+
+def _create(building, rooms, batch_size):
+    Room.objects.bulk_create(rooms, batch_size=batch_size)
+    # bulk_create skips the save signals that keep counters and caches current.
+    record_changes(Room, [
+        (None, {
+            'status': room.status, 'capacity': room.capacity,
+            'current_occupants': room.current_occupants, 'building_id': building.pk,
+        })
+        for room in rooms
+    ])
+    transaction.on_commit(lambda: (
+        bump_version(STATS_NAMESPACE), bump_version(SCOPE_NAMESPACE), availability.invalidate([building.pk]),
+    ))
@@ -0,0 +1,85 @@
+"""
+Occupancy reconciliation.
+
+``Room.current_occupants`` is a stored counter, and deleting a user or
+an application does not give the bed back. ``reconcile_occupancy``
+recomputes it from the facts, counting every student once: in the room
+of their active ``StudentProfile`` when it has one, otherwise in the
+``assigned_room`` of their latest accepted application. It then fixes
+every drifted room, and the status that follows from its occupancy, in
+one bulk update.
+"""
+from collections import Counter as Tally, namedtuple
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+from accounts.models import StudentProfile
+from applications.models import HousingApplication
+from core.bulk import update_rows
+from core.cache import bump_version
+from core.counters import record_changes
+from core.stats import STATS_NAMESPACE
+
+from . import availability
+from .models import Room
+
+RoomDrift = namedtuple('RoomDrift', [
+    'room_id', 'building_id', 'building', 'number', 'capacity', 'stored', 'actual', 'old_status', 'new_status',
+])
+
+
+def actual_occupancy():
+    """``{room id: occupants}``, with every student in exactly one room."""
+    rooms = dict(
+        StudentProfile.objects.filter(is_active=True, room__isnull=False).values_list('user_id', 'room_id').iterator()
+    )
+    # Applications without a student account still hold a bed: key them by their own (negated) pk.
+    applied = dict(
+        HousingApplication.objects
+        .filter(status=HousingApplication.Status.ACCEPTED, assigned_room__isnull=False)
+        .order_by('pk')  # The latest application wins.
+        .values_list(Coalesce('student_id', -F('pk')), 'assigned_room_id')
+        .iterator()
+    )
+    for student, room_id in applied.items():
+        rooms.setdefault(student, room_id)  # The profile room takes precedence.
+    return Tally(rooms.values())
+
+
+def _status(status, occupants, capacity):
+    if status == Room.Status.MAINTENANCE:
+        return status
+    return Room.Status.OCCUPIED if occupants >= capacity else Room.Status.AVAILABLE
+
+
+def reconcile_occupancy(dry_run=False):
+    """Return the drifted rooms, after fixing them unless ``dry_run``."""
+    with transaction.atomic():
+        occupancy = actual_occupancy()
+        rooms = Room.objects.values_list(
+            'pk', 'building_id', 'building__name', 'number', 'capacity', 'current_occupants', 'status',
+        )
+        if not dry_run:
+            rooms = rooms.select_for_update()
+
+        drifted, building_ids = [], set()
+        for pk, building_id, building, number, capacity, stored, status in rooms.order_by('building__name', 'number'):
+            actual = occupancy.get(pk, 0)
+            new_status = _status(status, actual, capacity)
+            if actual != stored or new_status != status:
+                drifted.append(RoomDrift(pk, building_id, building, number, capacity, stored, actual, status, new_status))
+                building_ids.add(building_id)
+
+        if drifted and not dry_run:
+            update_rows(Room, ['current_occupants', 'status'], ((d.room_id, (d.actual, d.new_status)) for d in drifted))
+            record_changes(Room, [
+                (
+                    {'status': d.old_status, 'capacity': d.capacity, 'current_occupants': d.stored, 'building_id': d.building_id},
+                    {'status': d.new_status, 'capacity': d.capacity, 'current_occupants': d.actual, 'building_id': d.building_id},
+                )
+                for d in drifted
+            ])
+            transaction.on_commit(lambda: (bump_version(STATS_NAMESPACE), availability.invalidate(building_ids)))
+    return drifted
@@ -0,0 +1,391 @@
+import io
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import StudentProfile
+from applications.models import HousingApplication
+from core.counters import read_counter, rebuild_counters
+from core.pagination import encode_cursor, paginate
+from . import availability
+from .allocation import RoomUnavailable, allocate
+from .provisioning import ProvisionError, csv_rooms, pattern_rooms, provision_rooms
+from .history import capture_snapshots, occupancy_history
+from .models import Building, OccupancySnapshot, Room
+from .reconciliation import reconcile_occupancy
+
+User = get_user_model()
+
+
+class RoomListTests(TestCase):
+    def setUp(self):
+        self.north = Building.objects.create(name='North', address='Campus')
+        self.south = Building.objects.create(name='South', address='Campus')
+        for building in (self.north, self.south):
+            for n in range(1, 13):
+                Room.objects.create(building=building, number=f'1{n:02d}', capacity=1 + n % 3, current_occupants=n % 2)
+        self.admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(self.admin)
+
+    def free_beds(self):
+        return F('capacity') - F('current_occupants')
+
+    def walk(self, ordering):
+        rooms = Room.objects.annotate(free_beds=self.free_beds())
+        pages = [paginate(rooms, ordering, per_page=5)]
+        while pages[-1].has_next:
+            pages.append(paginate(rooms, ordering, pages[-1].next_cursor, per_page=5))
+        return pages
+
+    def test_pages_cover_every_room_once_in_order(self):
+        for ordering in (('building_id', 'number'), ('-free_beds', 'id'), ('-capacity', 'id')):
+            pages = self.walk(ordering)
+            seen = [room.pk for page in pages for room in page]
+            expected = list(Room.objects.annotate(free_beds=self.free_beds()).order_by(*ordering).values_list('pk', flat=True))
+            self.assertEqual(seen, expected)
+
+    def test_previous_cursor_returns_the_earlier_page(self):
+        pages = self.walk(('-free_beds', 'id'))
+        rooms = Room.objects.annotate(free_beds=self.free_beds())
+        back = paginate(rooms, ('-free_beds', 'id'), pages[2].previous_cursor, per_page=5)
+        self.assertEqual([r.pk for r in back], [r.pk for r in pages[1]])
+        first = paginate(rooms, ('-free_beds', 'id'), pages[1].previous_cursor, per_page=5)
+        self.assertFalse(first.has_previous)
+
+    def test_filters(self):
+        response = self.client.get(reverse('room_list'), {'building': self.south.pk, 'min_free': 2})
+        rooms = list(response.context['rooms'])
+        self.assertTrue(rooms)
+        self.assertTrue(all(room.building_id == self.south.pk and room.free_beds >= 2 for room in rooms))
+
+    def test_tampered_cursor_means_the_first_page(self):
+        first = list(self.client.get(reverse('room_list')).context['rooms'])
+        for values in (['abc', 'x'], [None, 1], [[1], {}]):
+            cursor = encode_cursor('next', values)
+            response = self.client.get(reverse('room_list'), {'cursor': cursor})
+            self.assertEqual(list(response.context['rooms']), first)
+
+    def test_query_count_does_not_grow_with_rooms(self):
+        Room.objects.bulk_create(Room(building=self.north, number=f'2{n:02d}') for n in range(100))
+        response = self.client.get(reverse('room_list'))
+        with self.assertNumQueries(4):
+            # session, user, buildings for the filter, rooms page
+            response = self.client.get(reverse('room_list') + response.context['next_url'])
+        self.assertEqual(response.status_code, 200)
+
+
+class BuildingSummaryTests(TestCase):
+    def setUp(self):
+        self.supervisor = User.objects.create_user(
+            username='sup', password='password', governorate="Ibb", role='SUPERVISOR', first_name='Ali', last_name='Saleh',
+        )
+        self.building = Building.objects.create(name='North', address='Campus', supervisor=self.supervisor)
+        Room.objects.create(building=self.building, number='101', capacity=2, current_occupants=2, status=Room.Status.OCCUPIED)
+        Room.objects.create(building=self.building, number='102', capacity=3, current_occupants=1)
+        Room.objects.create(building=self.building, number='103', capacity=2, status=Room.Status.MAINTENANCE)
+        Building.objects.create(name='Empty', address='Campus')
+        self.admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(self.admin)
+
+    def test_with_occupancy(self):
+        north, empty = Building.objects.with_occupancy().order_by('name').reverse()
+        self.assertEqual(
+            (north.total_rooms, north.total_capacity, north.occupied_beds, north.free_beds, north.maintenance_rooms),
+            (3, 7, 3, 4, 1),
+        )
+        self.assertEqual(north.supervisor_name, 'Ali Saleh')
+        self.assertEqual((empty.total_rooms, empty.free_beds, empty.supervisor_name), (0, 0, None))
+
+    def test_pages_do_not_grow_with_rooms(self):
+        Room.objects.bulk_create(Room(building=self.building, number=f'2{n:02d}') for n in range(100))
+        for url, queries in ((reverse('building_list'), 3), (reverse('building_detail', args=[self.building.pk]), 5)):
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+
+class AllocationTests(TestCase):
+    def setUp(self):
+        self.building = Building.objects.create(name='North', address='Campus')
+        self.room = Room.objects.create(building=self.building, number='101', capacity=2)
+
+    def test_last_bed_marks_room_occupied(self):
+        allocate(self.room)
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.current_occupants, self.room.status), (1, Room.Status.AVAILABLE))
+        allocate(self.room)
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.current_occupants, self.room.status), (2, Room.Status.OCCUPIED))
+        self.assertEqual(read_counter('rooms.occupied'), 1)
+        self.assertEqual(read_counter('rooms.current_occupants'), 2)
+        self.assertEqual(rebuild_counters(), 0)
+
+    def test_full_room_saves_nothing(self):
+        self.room.current_occupants = 2
+        self.room.save()
+        with self.assertRaises(RoomUnavailable):
+            allocate(self.room, lambda: Building.objects.create(name='Side effect', address='-'))
+        self.assertFalse(Building.objects.filter(name='Side effect').exists())
+
+    def test_maintenance_room_is_not_allocated(self):
+        self.room.status = Room.Status.MAINTENANCE
+        self.room.save()
+        with self.assertRaises(RoomUnavailable):
+            allocate(self.room)
+
+    def test_application_accept(self):
+        admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        student = User.objects.create_user(username='student', password='password', governorate="Ibb")
+        application = HousingApplication.objects.create(student=student, name='S', phone='1', age=20, governorate="Ibb")
+        self.client.force_login(admin)
+        self.client.post(
+            reverse('application_accept', args=[application.pk]), {'building': self.building.pk, 'room': self.room.pk},
+        )
+        application.refresh_from_db()
+        self.room.refresh_from_db()
+        self.assertEqual(application.status, HousingApplication.Status.ACCEPTED)
+        self.assertEqual(self.room.current_occupants, 1)
+
+    def test_application_is_accepted_once(self):
+        admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        student = User.objects.create_user(username='student', password='password', governorate="Ibb")
+        application = HousingApplication.objects.create(student=student, name='S', phone='1', age=20, governorate="Ibb")
+        other = Room.objects.create(building=self.building, number='102', capacity=2)
+        self.client.force_login(admin)
+        url = reverse('application_accept', args=[application.pk])
+        for room in (self.room, self.room, other):
+            self.client.post(url, {'building': self.building.pk, 'room': room.pk})
+        self.room.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.room.current_occupants, other.current_occupants), (1, 0))
+        self.assertEqual(HousingApplication.objects.get().assigned_room, self.room)
+        self.assertEqual(rebuild_counters(), 0)
+
+
+class ProvisioningTests(TestCase):
+    def setUp(self):
+        self.building = Building.objects.create(name='North', address='Campus')
+        Room.objects.create(building=self.building, number='105', capacity=2)
+        self.admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(self.admin)
+
+    def test_pattern_reports_conflicts_and_creates_the_rest(self):
+        report = provision_rooms(self.building, pattern_rooms(range(1, 3), range(1, 11), 2))
+        self.assertEqual(report.created, 19)
+        self.assertEqual(report.conflicts, [('105', 'room 105 already exists')])
+        self.assertEqual(self.building.rooms.count(), 20)
+        self.assertEqual(read_counter('rooms.capacity'), 40)
+        self.assertEqual(rebuild_counters(), 0)
+
+    def test_csv_upload(self):
+        upload = SimpleUploadedFile('rooms.csv', b'number,capacity,status\nA1,3,\nA1,2,\nA2,x,\nA3,,maintenance\nA4,1,,extra\n105,1,\n')
+        response = self.client.post(reverse('room_provision'), {
+            'building': self.building.pk, 'source': 'csv', 'capacity': 2, 'csv_file': upload,
+        })
+        self.assertEqual(len(response.context['report'].conflicts), 4)
+        rooms = dict(self.building.rooms.values_list('number', 'capacity'))
+        self.assertEqual(rooms, {'105': 2, 'A1': 3, 'A3': 2})
+
+    def test_dry_run_creates_nothing(self):
+        out = io.StringIO()
+        call_command('provision_rooms', 'North', floors=range(1, 9), numbers=range(1, 51), dry_run=True, stdout=out)
+        self.assertIn('Would create 399 rooms', out.getvalue())
+        self.assertEqual(self.building.rooms.count(), 1)
+
+    def test_rejects_unsafe_input(self):
+        url = reverse('room_provision')
+        pattern = {'building': self.building.pk, 'source': 'pattern', 'capacity': 2,
+                   'floor_from': 1, 'floor_to': 1, 'number_from': 1, 'number_to': 2}
+        for number_format in ('{floor.real}', '{floor:>999999999}', '{number!r}', '{0}', '{floor'):
+            response = self.client.post(url, {**pattern, 'number_format': number_format})
+            self.assertIn('number_format', response.context['form'].errors)
+        response = self.client.post(url, {**pattern, 'number_format': 'B{floor}-{number:03d}'})
+        self.assertEqual(sorted(self.building.rooms.values_list('number', flat=True)), ['105', 'B1-001', 'B1-002'])
+
+        rows = 'number\n' + ''.join(f'C{n}\n' for n in range(5))
+        with self.assertRaisesMessage(ProvisionError, 'more than 4 rooms'):
+            provision_rooms(self.building, csv_rooms(io.StringIO(rows), max_rooms=4))
+        self.assertFalse(self.building.rooms.filter(number__startswith='C').exists())
+
+        rows = csv_rooms(io.StringIO('number,capacity\n101,2,extra\n102\n'))
+        self.assertEqual(list(rows), [('line 2', 'too many columns'), ('line 3', {'number': '102', 'capacity': 1, 'status': 'available'})])
+
+    def test_concurrently_created_numbers(self):
+        def specs():
+            yield 'A1', {'number': 'A1', 'capacity': 1}
+            Room.objects.create(building=self.building, number='A1', capacity=1)  # Another admin, meanwhile.
+
+        with self.assertRaises(ProvisionError):
+            provision_rooms(self.building, specs())
+        self.assertEqual(self.building.rooms.count(), 2)
+        self.assertEqual(rebuild_counters(), 0)
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.men = Building.objects.create(name='Men', address='Campus', gender=Building.Gender.MALE)
+        self.mixed = Building.objects.create(name='Mixed', address='Campus')
+        self.single = Room.objects.create(building=self.men, number='101', capacity=1)
+        self.double = Room.objects.create(building=self.men, number='102', capacity=2, current_occupants=1)
+        Room.objects.create(building=self.men, number='103', capacity=2, status=Room.Status.MAINTENANCE)
+        Room.objects.create(building=self.mixed, number='201', capacity=3)
+
+    def test_lookups(self):
+        self.assertEqual([room['number'] for room in availability.open_rooms(self.men.pk)], ['101', '102'])
+        self.assertEqual(availability.next_rooms(self.men.pk, capacity=2), [
+            {'id': self.double.pk, 'number': '102', 'capacity': 2, 'free': 1},
+        ])
+        self.assertEqual(availability.free_beds(), 5)
+        self.assertEqual(availability.free_beds(gender='F'), 3)
+        self.assertEqual(availability.free_beds(gender='M', capacity=2), 1)
+
+    def test_index_follows_allocations_and_edits(self):
+        availability.open_rooms(self.men.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            allocate(self.single)
+        self.assertEqual([room['number'] for room in availability.open_rooms(self.men.pk)], ['102'])
+
+        self.double.current_occupants = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.double.save()
+        self.assertEqual(availability.free_beds_by_building()[self.men.pk]['free'], 2)
+
+    def test_cached_lookups_do_not_query(self):
+        availability.open_rooms(self.men.pk)
+        availability.free_beds()
+        with self.assertNumQueries(0):
+            availability.open_rooms(self.men.pk)
+            availability.free_beds()
+
+    def test_open_rooms_endpoint_revalidates(self):
+        admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(admin)
+        url = reverse('building_open_rooms', args=[self.men.pk])
+
+        response = self.client.get(url)
+        self.assertEqual([room['number'] for room in response.json()['rooms']], ['101', '102'])
+        self.assertTrue(response.has_header('Last-Modified'))
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual([room['number'] for room in self.client.get(url, {'capacity': 2}).json()['rooms']], ['102'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            allocate(self.single)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room['number'] for room in response.json()['rooms']], ['102'])
+
+    def test_heatmap(self):
+        Room.objects.create(building=self.men, number='201', capacity=2, current_occupants=2)
+        Room.objects.create(building=self.men, number='1001', capacity=1)
+        admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(admin)
+        url = reverse('building_heatmap_data', args=[self.men.pk])
+
+        data = self.client.get(url).json()
+        self.assertEqual(data['states'], 'EPMFE')
+        self.assertEqual(data['numbers'], ['101', '102', '103', '201', '1001'])
+        self.assertEqual(data['floors'], [['1', 0, 3], ['2', 3, 1], ['10', 4, 1]])
+        self.assertEqual(data['counts'], {'E': 2, 'P': 1, 'F': 1, 'M': 1})
+        with self.assertNumQueries(3):  # Session, user and the building check; the map is cached.
+            self.client.get(url)
+
+        self.single.status = Room.Status.MAINTENANCE
+        with self.captureOnCommitCallbacks(execute=True):
+            self.single.save()
+        self.assertEqual(self.client.get(url).json()['states'], 'MPMFE')
+        self.assertContains(self.client.get(reverse('building_heatmap', args=[self.men.pk])), 'heatmap')
+
+
+class ReconciliationTests(TestCase):
+    def setUp(self):
+        self.building = Building.objects.create(name='North', address='Campus')
+        self.room = Room.objects.create(building=self.building, number='101', capacity=2)
+        self.other = Room.objects.create(building=self.building, number='102', capacity=1)
+
+    def accept(self, username, room):
+        student = User.objects.create_user(username=username, password='password', governorate="Ibb")
+        HousingApplication.objects.create(
+            student=student, name='S', phone='1', age=20, governorate="Ibb",
+            status=HousingApplication.Status.ACCEPTED, assigned_building=self.building, assigned_room=room,
+        )
+        return student
+
+    def test_recomputes_occupancy_and_status(self):
+        first = self.accept('first', self.room)
+        StudentProfile.objects.create(user=first, room=self.room)  # Same student, counted once.
+        self.accept('second', self.other)
+        Room.objects.filter(pk=self.room.pk).update(current_occupants=2, status=Room.Status.OCCUPIED)
+        rebuild_counters()  # The counters follow the stored (drifted) rooms.
+
+        drifted = reconcile_occupancy(dry_run=True)
+        self.assertEqual([(d.number, d.stored, d.actual) for d in drifted], [('101', 2, 1), ('102', 0, 1)])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.current_occupants, 2)
+
+        call_command('reconcile_occupancy', stdout=io.StringIO())
+        self.assertEqual(
+            list(Room.objects.order_by('number').values_list('current_occupants', 'status')),
+            [(1, Room.Status.AVAILABLE), (1, Room.Status.OCCUPIED)],
+        )
+        self.assertEqual(reconcile_occupancy(), [])
+        self.assertEqual(rebuild_counters(), 0)
+
+    def test_profile_room_takes_precedence(self):
+        mover = self.accept('mover', self.room)
+        StudentProfile.objects.create(user=mover, room=self.other)  # Moved after the application was accepted.
+        self.assertEqual(
+            [(d.number, d.actual) for d in reconcile_occupancy()], [('102', 1)],
+        )
+        self.assertEqual(dict(Room.objects.values_list('number', 'current_occupants')), {'101': 0, '102': 1})
+
+    def test_deleted_student_frees_the_bed(self):
+        student = self.accept('leaver', self.room)
+        reconcile_occupancy()
+        student.delete()
+        self.assertEqual([d.actual for d in reconcile_occupancy()], [0])
+
+
+class OccupancyHistoryTests(TestCase):
+    def setUp(self):
+        self.north = Building.objects.create(name='North', address='Campus')
+        self.south = Building.objects.create(name='South', address='Campus')
+        self.room = Room.objects.create(building=self.north, number='101', capacity=4)
+        Room.objects.create(building=self.south, number='101', capacity=4, current_occupants=4, status=Room.Status.OCCUPIED)
+
+    def capture(self, day, occupants):
+        Room.objects.filter(pk=self.room.pk).update(current_occupants=occupants)
+        return capture_snapshots(day)
+
+    def test_capture_is_one_row_per_building_per_day(self):
+        self.assertEqual(self.capture(date(2025, 3, 3), 1), 2)
+        self.capture(date(2025, 3, 3), 2)
+        self.assertEqual(OccupancySnapshot.objects.count(), 2)
+        self.assertEqual(OccupancySnapshot.objects.get(building=self.north).occupied, 2)
+
+    def test_downsampling(self):
+        # Monday to Wednesday of one week, then the Monday after.
+        for day, occupants in ((3, 0), (4, 2), (5, 4), (10, 3)):
+            self.capture(date(2025, 3, day), occupants)
+
+        weeks = occupancy_history(date(2025, 3, 1), date(2025, 3, 31), building=self.north, bucket='week')
+        self.assertEqual(
+            [(p['date'], p['occupied'], p['peak'], p['rate']) for p in weeks],
+            [(date(2025, 3, 3), 2, 4, 50.0), (date(2025, 3, 10), 3, 3, 75.0)],
+        )
+        campus = occupancy_history(date(2025, 3, 4), date(2025, 3, 10), bucket='month')
+        self.assertEqual([(p['date'], p['capacity'], p['occupied']) for p in campus], [(date(2025, 3, 1), 8, 7)])
+
+    def test_building_page_charts_history(self):
+        capture_snapshots()
+        admin = User.objects.create_superuser(username='admin', password='password', governorate="Sana'a")
+        self.client.force_login(admin)
+        response = self.client.get(reverse('building_detail', args=[self.north.pk]))
+        self.assertContains(response, 'occupancyHistoryChart')
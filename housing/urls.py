@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
-    building_list, building_create, building_update, building_delete, building_detail,
-    room_list, room_create, room_update, room_delete, room_detail,
+    building_list, building_create, building_update, building_delete, building_detail, building_open_rooms,
+    building_heatmap, building_heatmap_data,
+    room_list, room_create, room_provision, room_update, room_delete, room_detail,
 )
 
 urlpatterns = [
@@ -11,8 +12,12 @@ urlpatterns = [
     path('housing/buildings/<int:pk>/update/', building_update, name='building_update'),
     path('housing/buildings/<int:pk>/delete/', building_delete, name='building_delete'),
     path('housing/buildings/<int:pk>/', building_detail, name='building_detail'),
+    path('housing/buildings/<int:pk>/heatmap/', building_heatmap, name='building_heatmap'),
+    path('housing/buildings/<int:pk>/heatmap/data/', building_heatmap_data, name='building_heatmap_data'),
+    path('housing/buildings/<int:pk>/rooms/open/', building_open_rooms, name='building_open_rooms'),
     path('housing/rooms/list/', room_list, name='room_list'),
     path('housing/rooms/create/', room_create, name='room_create'),
+    path('housing/rooms/provision/', room_provision, name='room_provision'),
     path('housing/rooms/<int:pk>/update/', room_update, name='room_update'),
     path('housing/rooms/<int:pk>/delete/', room_delete, name='room_delete'),
     path('housing/rooms/<int:pk>/', room_detail, name='room_detail'),
@@ -1,8 +1,19 @@
 from .models import Building, Room
-from .forms import BuildingForm, RoomForm
+from .forms import BuildingForm, RoomForm, RoomFilterForm, RoomProvisionForm
+from . import availability
+from .history import occupancy_history
+from .provisioning import ProvisionError, provision_rooms
+from core.pagination import paginate
+from datetime import timedelta
+
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils import timezone
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 
 
 def is_admin(user):
@@ -19,7 +30,7 @@ def building_list(request):
 
     Accessible to logged-in users.
     """
-    buildings = Building.objects.all()
+    buildings = Building.objects.with_occupancy().order_by('name')
     return render(request, 'housing/building_list.html', {'buildings': buildings})
 
 
@@ -74,22 +85,49 @@ def building_delete(request, pk):
 
 # Room Views
 
+# Keyset orderings for room_list; each ends in a unique key and has a matching index.
+ROOM_SORTS = {
+    'building': ('building_id', 'number'),
+    'free': ('-free_beds', 'id'),
+    'capacity': ('-capacity', 'id'),
+}
+
+
 @login_required
 def room_list(request):
     """
-    List all rooms.
+    List rooms, one keyset page at a time.
 
-    Can be filtered by 'building' ID.
+    Can be filtered by status, building, minimum free beds and capacity,
+    and sorted by building, free beds or capacity. Pages are addressed
+    by a 'cursor' parameter, so every page costs the same to load.
     Accessible to all logged-in users.
     """
-    rooms = Room.objects.all()
-    
-    building_id = request.GET.get('building')
-    if building_id:
-        # Secure ORM usage for filtering
-        rooms = rooms.filter(building_id=building_id)
-    
-    return render(request, 'housing/room_list.html', {'rooms': rooms, 'building_id': building_id})
+    form = RoomFilterForm(request.GET or None)
+    filters = form.cleaned_data if form.is_valid() else {}
+
+    rooms = Room.objects.select_related('building').annotate(free_beds=F('capacity') - F('current_occupants'))
+    if filters.get('status'):
+        rooms = rooms.filter(status=filters['status'])
+    if filters.get('building'):
+        rooms = rooms.filter(building=filters['building'])
+    if filters.get('min_free'):
+        rooms = rooms.filter(free_beds__gte=filters['min_free'])
+    if filters.get('capacity'):
+        rooms = rooms.filter(capacity=filters['capacity'])
+
+    page = paginate(rooms, ROOM_SORTS[filters.get('sort') or 'building'], request.GET.get('cursor'))
+
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    page_url = lambda cursor: f"?{params.urlencode() + '&' if params else ''}cursor={cursor}"
+    return render(request, 'housing/room_list.html', {
+        'rooms': page,
+        'form': form,
+        'filtered': any(filters.values()),
+        'next_url': page_url(page.next_cursor) if page.has_next else None,
+        'previous_url': page_url(page.previous_cursor) if page.has_previous else None,
+    })
 
 
 @login_required
@@ -109,6 +147,37 @@ def room_create(request):
     return render(request, 'housing/room_form.html', {'form': form, 'title': 'Add Room'})
 
 
+@login_required
+@user_passes_test(is_admin)
+def room_provision(request):
+    """
+    Bulk-create rooms from a floor/number pattern or a CSV file (Admin only).
+
+    Every conflict (existing or repeated numbers, unreadable CSV rows) is
+    listed; the remaining rooms are still created unless it is a dry run.
+    """
+    report = None
+    if request.method == 'POST':
+        form = RoomProvisionForm(request.POST, request.FILES)
+        if form.is_valid():
+            building = form.cleaned_data['building']
+            dry_run = form.cleaned_data['dry_run']
+            try:
+                report = provision_rooms(building, form.specs(), dry_run=dry_run)
+            except ProvisionError as exc:
+                form.add_error(None, str(exc))
+            else:
+                if dry_run:
+                    messages.info(request, f'Dry run: {report.created} rooms would be created in {building}.')
+                elif report.created:
+                    messages.success(request, f'{report.created} rooms created in {building}.')
+                if report.conflicts:
+                    messages.warning(request, f'{len(report.conflicts)} rooms were skipped.')
+    else:
+        form = RoomProvisionForm()
+    return render(request, 'housing/room_provision.html', {'form': form, 'report': report})
+
+
 @login_required
 @user_passes_test(is_admin)
 def room_update(request, pk):
@@ -141,11 +210,28 @@ def room_delete(request, pk):
     return render(request, 'housing/confirm_delete.html', {'object': room})
 
 
+HISTORY_WEEKS = 26
+
+
 @login_required
 def building_detail(request, pk):
-    """View building details."""
-    building = get_object_or_404(Building, pk=pk)
-    return render(request, 'housing/building_detail.html', {'building': building})
+    """
+    View building details.
+
+    Totals come from the occupancy summary; only the first page of rooms
+    is listed, with a link to the full, paginated room list. The chart
+    shows weekly occupancy over the last HISTORY_WEEKS weeks.
+    """
+    building = get_object_or_404(Building.objects.with_occupancy(), pk=pk)
+    rooms = paginate(building.rooms.all(), ROOM_SORTS['building'])
+    today = timezone.localdate()
+    history = occupancy_history(today - timedelta(weeks=HISTORY_WEEKS), today, building=building.pk, bucket='week')
+    return render(request, 'housing/building_detail.html', {
+        'building': building,
+        'rooms': rooms,
+        'history_labels': [point['date'].isoformat() for point in history],
+        'history_rates': [point['rate'] for point in history],
+    })
 
 
 @login_required
@@ -153,3 +239,54 @@ def room_detail(request, pk):
     """View room details."""
     room = get_object_or_404(Room, pk=pk)
     return render(request, 'housing/room_detail.html', {'room': room})
+
+
+def _rooms_etag(request, pk):
+    return f'"{availability.version_stamp(pk)}"'
+
+
+def _rooms_last_modified(request, pk):
+    return availability.last_modified(pk)
+
+
+@login_required
+@user_passes_test(is_admin)
+@condition(etag_func=_rooms_etag, last_modified_func=_rooms_last_modified)
+def building_open_rooms(request, pk):
+    """
+    JSON list of the building's rooms with a free bed, read from the
+    availability index (Admin only). Responses carry an ETag and
+    Last-Modified tied to the index version, so a browser revalidating an
+    unchanged building gets a 304 without the index being rebuilt.
+    Optional ``?capacity=N`` keeps only rooms of N beds.
+    """
+    building = get_object_or_404(Building, pk=pk)
+    capacity = request.GET.get('capacity')
+    rooms = availability.open_rooms(building.pk, int(capacity) if capacity and capacity.isdigit() else None)
+    response = JsonResponse({'building': building.pk, 'rooms': rooms})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+@user_passes_test(is_admin)
+def building_heatmap(request, pk):
+    """Floor-by-floor map of room states (Admin only); drawn from building_heatmap_data."""
+    building = get_object_or_404(Building, pk=pk)
+    return render(request, 'housing/building_heatmap.html', {
+        'building': building, 'states': availability.HEATMAP_STATES,
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+@condition(etag_func=_rooms_etag)
+def building_heatmap_data(request, pk):
+    """
+    The building's heatmap as JSON (Admin only), one cached read per
+    request; see ``housing.availability.heatmap`` for the encoding.
+    """
+    get_object_or_404(Building, pk=pk)
+    response = JsonResponse(availability.heatmap(pk))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response